@@ -1,49 +1,234 @@
-from Maze import Maze
+from Environment import Environment
 from Policy import Policy
+from Solver import Solver
+from ValueChangeTracker import ValueChangeTracker
+from Profiler import NullProfiler
 from time import sleep
+import numpy as np
+import threading
 import math
+import os
 
 class Agent():
 
     maze = None
     policy = Policy()
+    solver = Solver()
     sleep_t = 0 # To add delay when visualizing maze
     epsilon = 0.01
 
     num_rows = 6
     num_cols = 6
     cell_size = 150
-
-
-    def __init__(self, num_rows=6, num_cols=6, cell_size=150):
+    render = True # Visualize the maze with pygame, or train headless
+    grid = None # Layout of the maze, the default maze is used if not set
+    copy_grid = True # Give every maze its own copy of the grid, or train on the grid in place
+    steps = 0 # Number of steps taken during the last autonomous play
+    converged = False # Whether the last autonomous play reached convergence
+    stopped = False # Set to stop a headless autonomous play from another thread
+
+    # Progress of the current autonomous play, read by the renderer of threaded play
+    run = 0
+    exploration_rate = 0
+    value_changes = None
+
+    # Checkpoints of the learned values, saved every checkpoint_every runs if a path is set
+    checkpoint_path = None
+    checkpoint_every = 100
+    checkpoint = None # Loaded checkpoint, which the next autonomous play resumes from
+
+    learner = None # Model-free QLearner, the agent learns state values from the rewards of the maze if not set
+    profiler = NullProfiler() # Times the phases of autonomous play when set to a Profiler
+    recorder = None # Recorder that writes frames of autonomous play to images or a video file
+    trajectory_log = None # TrajectoryLog that every step of autonomous play is written to
+
+    values_version = 0 # Bumped whenever the values of the maze are written, so cached routes know to rebuild
+    cached_routes = None # Routes of the current maze, returned by routes()
+
+
+    def __init__(self, num_rows=6, num_cols=6, cell_size=150, render=True, grid=None, copy_grid=True, learner=None,
+                 seed=None, profiler=None, recorder=None, trajectory_log=None):
+        """
+        :param seed: seed of the random number generators of the policy and the learner, so games are reproducible
+        :param profiler: optional Profiler, which times every phase of autonomous play
+        :param recorder: optional Recorder, which records frames of autonomous play offscreen, also when headless
+        :param trajectory_log: optional TrajectoryLog, or the path of a log file, to which every step is written
+        """
 
         self.num_rows = num_rows
         self.num_cols = num_cols
         self.cell_size = cell_size
+        self.render = render
+        self.copy_grid = copy_grid
+
+        # A given layout replaces the size of the default maze
+        self.grid = grid
+        if grid is not None:
+            self.num_rows, self.num_cols = grid.num_rows, grid.num_cols
+
+        # Independent random number streams for the policy and the learner
+        policy_seed, learner_seed = np.random.SeedSequence(seed).spawn(2)
+        self.policy = Policy(policy_seed)
+
+        # Learn action values from experienced transitions, instead of state values from the rewards of the maze.
+        # The learner is given as QLearner, or as "q_learning" or "sarsa" to create one with default settings.
+        if isinstance(learner, str):
+            from QLearner import QLearner
+            learner = QLearner(self.num_rows, self.num_cols, learner, seed=learner_seed)
+        self.learner = learner
+
+        if profiler is not None:
+            self.profiler = profiler
+        self.recorder = recorder
+
+        if isinstance(trajectory_log, str):
+            from TrajectoryLog import TrajectoryLog
+            trajectory_log = TrajectoryLog(trajectory_log, self.num_rows, self.num_cols)
+        self.trajectory_log = trajectory_log
+
+
+    def create_maze(self):
+        """
+        Create a new maze. When rendering is turned off, a headless environment is created instead,
+        so pygame is never imported and no images are loaded.
+        Every maze gets its own copy of the grid of the agent, so learned values don't carry over,
+        unless copy_grid is turned off. Then the values are learned in place, e.g. straight into a memory-mapped grid file.
+        """
+        grid = self.grid
+        if grid is not None and self.copy_grid:
+            grid = grid.copy()
+        self.values_version += 1
+        if not self.render:
+            return Environment(self.num_rows, self.num_cols, grid)
+
+        from Maze import Maze
+        return Maze(self.num_rows, self.num_cols, self.cell_size, grid)
 
 
     def set_sleep(self, sleep):
         self.sleep_t = sleep
 
 
+    def set_checkpointing(self, path, every=100):
+        """
+        Save a checkpoint to path every given number of runs during autonomous play.
+        """
+        self.checkpoint_path = path
+        self.checkpoint_every = every
+
+
+    def save_checkpoint(self, path):
+        """
+        Save the learned state values, the value changes tracker, the run and step counters, the convergence flag,
+        the layout of the maze, the random number generator state of the policy and the state of the learner
+        to a compressed .npz file. The file is replaced atomically, so an interrupted save never leaves
+        a broken checkpoint behind.
+        """
+        learner = self.learner.get_state() if self.learner is not None else {}
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez_compressed(file, values=self.maze.values, value_changes=self.value_changes.changes,
+                                run=self.run, steps=self.steps, converged=self.converged, ids=self.maze.ids,
+                                terminals=self.maze.terminals, **self.policy.get_state(), **learner)
+        os.replace(temp_path, path)
+
+
+    def load_checkpoint(self, path):
+        """
+        Load a checkpoint saved with save_checkpoint. The next autonomous play resumes from it,
+        instead of starting with all values at 0.
+        A checkpoint of a maze with another size or layout can be used to warm-start learning:
+        the values of the overlapping states are copied, and all states are seen as unoptimal again.
+        """
+        with np.load(path) as data:
+            self.checkpoint = {key: data[key] for key in data.files}
+
+
+    def restore_checkpoint(self, value_changes):
+        """
+        Restore the loaded checkpoint into the current maze and value changes tracker.
+
+        :return: the run counter to resume from
+        """
+        checkpoint, self.checkpoint = self.checkpoint, None
+        values = checkpoint["values"]
+
+        # Copy the values of the overlapping states, walls and terminal states keep their value
+        num_rows, num_cols = min(values.shape[0], self.maze.num_rows), min(values.shape[1], self.maze.num_cols)
+        open_states = self.maze.grid.open_mask()[:num_rows, :num_cols]
+        self.maze.values[:num_rows, :num_cols][open_states] = values[:num_rows, :num_cols][open_states]
+        self.values_version += 1
+
+        same_layout = (values.shape == self.maze.values.shape and np.array_equal(checkpoint["ids"], self.maze.ids)
+                       and np.array_equal(checkpoint["terminals"], self.maze.terminals))
+        if not same_layout:
+            # Warm start on another maze, learn from the first run again
+            return 0
+
+        value_changes.update_all(checkpoint["value_changes"])
+        if self.learner is not None and "q_values" in checkpoint:
+            self.learner.set_state(checkpoint)
+        self.steps = int(checkpoint["steps"])
+        self.converged = bool(checkpoint["converged"])
+        self.policy.set_state(checkpoint)
+        return int(checkpoint["run"])
+
+
     def act(self, best_action, convergence=False):
-        self.maze.step(best_action, convergence)
+        return self.maze.step(best_action, convergence)
 
+    def learn_step(self, action, probability, exploration_rate, random_agent, convergence):
+        """
+        Take one step with the model-free learner: act out the given action, store the transition in the
+        replay buffer, update the Q-table from a minibatch and record the value changes.
+        The best action values are copied into the state values of the maze, so they can be visualized.
 
-    def get_exploration_rate(self, value_changes_list, decay_factor):
+        :param action: the action to take from the current state
+        :return: the action to take from the next state, None when the next state is a terminal state
+        """
+        learner = self.learner
+        row, col = self.maze.agent_row, self.maze.agent_col
+        value = self.maze.values[row, col]
+        state = learner.state(row, col)
+        reward = self.act(action, convergence)
+        next_state = learner.state(self.maze.agent_row, self.maze.agent_col)
+        done = self.maze.is_terminal()
+        self.profiler.tick("step")
+
+        # SARSA bootstraps from the next action, so it is selected before learning
+        next_action = None
+        if not done:
+            next_action = self.policy.choose_action(learner.q_values[next_state], probability,
+                                                    exploration_rate, random_agent)
+        self.profiler.tick("select_action")
+        learner.add(state, action, reward, next_state, done, next_action or 0)
+
+        states, changes = learner.learn()
+        self.maze.values.reshape(-1)[states] = learner.state_values(states)
+        self.values_version += 1
+        self.profiler.tick("update_values")
+        self.value_changes.update_states(states, changes)
+        if self.trajectory_log is not None:
+            new_value = self.maze.values[row, col]
+            self.trajectory_log.log(self.run, self.steps + 1, row, col, action, self.maze.agent_row,
+                                    self.maze.agent_col, reward, new_value, abs(new_value - value), done)
+        self.profiler.tick("track")
+        return next_action
+
+
+    def get_exploration_rate(self, value_changes, decay_factor):
         """
         Calculates the exploration rate based on the number of unoptimal states. 
         The exploration rate starts at 1.0 and gradually decays as the agent learns 
         to navigate the maze more efficiently.
 
-        :param: value_changes_list (list): A list of value changes that keeps track up the latest updated value change.
+        :param: value_changes (ValueChangeTracker): Tracker that keeps track of the latest updated value change of each state.
 
         :return: float: The exploration rate, between 0 and 1.
         """
 
-        flattened_value_changes = [item for sublist in value_changes_list for item in sublist]
         total_num_states = (self.maze.num_rows-2) * (self.maze.num_cols-2)
-        unoptimal_states = len([value_change for value_change in flattened_value_changes if value_change != 0])
+        unoptimal_states = value_changes.unoptimal_states
         max_exploration_rate = 1.0
         k = decay_factor  # decay factor
 
@@ -57,106 +242,277 @@ class Agent():
     
     def generate_value_changes_tracker(self):
         """
-        Generate a 2D matrix, which is a copy of the maze, in which the last value change of each state is saved.
+        Generate a tracker with a 2D matrix, which is a copy of the maze, in which the last value change of each state is saved.
         The matrix contains 1's for each state that will be updated, and 0's for terminal states and outer walls that are ignored.
-        :return: a 2D matrix of integers
+        States that the agent can't reach from its starting position, e.g. behind a finish in a generated maze,
+        are never visited, so they are ignored too.
+        :return: a ValueChangeTracker
         """        
 
-        # Initialize value_changes with 1's for all states
-        value_changes = [[1 for _ in range(self.num_cols)] for _ in range (self.num_rows)]
+        # Terminal states, outer walls and unreachable states are seen as optimal states already
+        start = (self.maze.default_agent_row, self.maze.default_agent_col)
+        return ValueChangeTracker(self.maze.grid.reachable_mask(start), self.epsilon)
 
-        # Set value changes of irrelevant states to 0, so they are ignored/seen as optimal states already.
-        for i in range(self.num_rows):
-            for j in range(self.num_cols):
-                # If it's a terminal state, mark it as irrelevant
-                if self.maze.maze[i][j]["terminal"]:
-                    value_changes[i][j] = 0
-                # If it's just an outer wall, mark it as irrelevant
-                if self.maze.maze[i][j]["id"] == 1:
-                    value_changes[i][j] = 0
-        return value_changes
-
-    def autonomous_play(self, random_agent=False, probability=1, exploration_rate_decay_factor=5):
+    def autonomous_play(self, random_agent=False, probability=1, exploration_rate_decay_factor=5, max_runs=None,
+                        warm_start=False, max_steps=None):
         """
         Play the game autonomously until convergence, where the maximum value change of all states 
         is below the threshold epsilon. The method will loop until convergence is achieved. 
 
+        When rendering is turned off, nothing is drawn and the agent never sleeps. Instead of shutting down
+        once the optimal route has been shown, the method returns the number of runs that were played.
+
         :param random_agent: a flag to control whether the agent takes random actions 
         :param probability: a value between 0 and 1 representing the probability of selecting the best action
+        :param max_runs: optional limit on the number of runs, after which the method returns without convergence.
+                         Runs before a resumed checkpoint are counted too.
+        :param max_steps: optional limit on the number of steps, after which the method returns in the middle of a run
+        :param warm_start: seed the values with the exact shortest path returns before learning.
+                           A verification sweep records the remaining Bellman error of every state in the tracker,
+                           so only states that the search couldn't solve still have to be learned.
+                           It reads the rewards of the maze, so it can't be used with a model-free learner.
+        :return: the number of runs, including the final run along the optimal route (headless only)
         """
 
-        # Create a new maze, reset convergence flag and run counter
-        self.maze = Maze(self.num_rows,self.num_cols,self.cell_size)
+        # Create a new maze, reset convergence flag, run and step counters
+        self.maze = self.create_maze()
         convergence = False
         run = 0
+        self.steps = 0
+        self.converged = False
+        self.stopped = False
 
         # Create a 2D matrix to track changes in state values
         value_changes = self.generate_value_changes_tracker()
+        self.value_changes = value_changes
+
+        # Seed the values with the shortest path returns from all terminal states and walls
+        if warm_start and self.learner is not None:
+            raise ValueError("A warm start reads the rewards of the maze, which a model-free learner can't use")
+        if warm_start:
+            values, _ = self.solver.shortest_path(self.maze.grid)
+            self.maze.values[...] = values
+            self.values_version += 1
+            errors = self.solver.bellman_errors(self.maze.values, self.maze.rewards)
+            # Only the states the tracker follows, which are still marked unoptimal at this point
+            value_changes.update_all(errors, value_changes.changes != 0)
+
+        # Resume from a loaded checkpoint, which may have been saved by the run that converged
+        if self.checkpoint is not None:
+            run = self.restore_checkpoint(value_changes)
+            self.run = run
+            if self.converged:
+                convergence = True
+                probability = 1
+                if self.render:
+                    self.set_sleep(1)
 
+        profiler = self.profiler
         while True: # Loop until convergence
             
             # Increment the run counter
+            if max_runs is not None and run >= max_runs:
+                return self.end_play(run)
             run += 1
+            self.run = run
+            profiler.start()
             # Generate the visualization of the maze, reset agent position and points earned
-            self.maze.generate_maze(reset=True, run=run)
+            if self.render:
+                self.maze.generate_maze(reset=True, run=run)
+            else:
+                self.maze.reset()
 
-            # Reset the delta, exploration rate
-            delta = 0
+            # Reset the exploration rate
             exploration_rate = self.get_exploration_rate(value_changes, exploration_rate_decay_factor)
             exploration_rate = round(exploration_rate, 2)
+            if convergence and self.learner is not None:
+                # The learner converges with small value changes left on many states, which keep the
+                # exploration rate above 0, so it plays out the optimal route without exploring
+                exploration_rate = 0
+            self.exploration_rate = exploration_rate
 
             # Visualize exploration_rate
-            self.maze.visualize_exploration_rate(exploration_rate)
-            sleep(0.5)
+            if self.render:
+                self.maze.visualize_exploration_rate(exploration_rate)
+                profiler.tick("render")
+                sleep(0.5)
+                profiler.tick("sleep")
+
+            # First action of the model-free learner, later actions are selected by learn_step
+            if self.learner is not None:
+                profiler.start()
+                state = self.learner.state(self.maze.agent_row, self.maze.agent_col)
+                action = self.policy.choose_action(self.learner.q_values[state], probability,
+                                                   exploration_rate, random_agent)
+                profiler.tick("select_action")
 
             while True: # Loop until terminal state
 
-                # Current coordinates of agent
-                x, y = self.maze.agent_row, self.maze.agent_col
+                if self.learner is not None:
+                    action = self.learn_step(action, probability, exploration_rate, random_agent, convergence)
+                    self.steps += 1
+                else:
+                    # Current coordinates of agent
+                    x, y = self.maze.agent_row, self.maze.agent_col
+
+                    # Value of state we landed on
+                    v = self.maze.values[x, y]
+                    self.maze.update_values()
+                    self.values_version += 1
+                    profiler.tick("update_values")
+
+                    # Find best action from current state, and act it out
+                    _, best_action = self.policy.select_action(self.maze, probability, exploration_rate, random_agent)
+                    profiler.tick("select_action")
+                    reward = self.act(best_action, convergence)
+                    self.steps += 1
+                    profiler.tick("step")
+
+                    # Updated value of current state
+                    v_prime = self.maze.values[x, y]
+                    # Record value change
+                    value_changes.update(x, y, abs(v-v_prime))
+                    if self.trajectory_log is not None:
+                        self.trajectory_log.log(run, self.steps, x, y, best_action, self.maze.agent_row,
+                                                self.maze.agent_col, reward, v_prime, abs(v-v_prime),
+                                                self.maze.is_terminal())
+                    profiler.tick("track")
+
+                if self.render:
+                    # Generate the new updated maze, where agent took best next action
+                    self.maze.generate_maze(run=run, exploration_rate=exploration_rate)
+
+                    # Visualize convergence
+                    if convergence:
+                        self.maze.visualize_convergence()
+                    profiler.tick("render")
+                    sleep(self.sleep_t)
+                    profiler.tick("sleep")
+
+                if self.recorder is not None:
+                    self.recorder.record(self.maze, run, exploration_rate, convergence)
+                    profiler.tick("render")
 
-                # Value of state we landed on
-                v = self.maze.maze[x][y]["value"]
-                self.maze.update_values()
+                # End run if we land on a terminal state
+                if self.maze.is_terminal():
+                    break
 
-                # Find best action from current state, and act it out
-                _, best_action = self.policy.select_action(self.maze, probability, exploration_rate, random_agent)
-                self.act(best_action, convergence)
+                if self.stopped or (max_steps is not None and self.steps >= max_steps):
+                    profiler.end_episode(run)
+                    return self.end_play(run)
 
-                # Updated value of current state
-                v_prime = self.maze.maze[x][y]["value"]
-                # Record value change
-                value_changes[x][y] = abs(v-v_prime)
+            profiler.end_episode(run)
 
-                # Generate the new updated maze, where agent took best next action
-                self.maze.generate_maze(run=run, exploration_rate=exploration_rate)
+            # The optimal route has been played out after convergence
+            if convergence:
+                return self.end_play(run)
 
-                # Visualize convergence
-                if convergence:
+            # Check if the biggest value change of all states is below epsilon
+            if value_changes.converged():
+                # Set convergence flag to True and reset probability to 1
+                convergence = True
+                self.converged = True
+                probability = 1
+
+                if self.render:
+                    # Visualize convergence and exploration rate
                     self.maze.visualize_convergence()
-                sleep(self.sleep_t)
+                    self.maze.visualize_exploration_rate(round(exploration_rate, 2))
 
-                # End run if we land on a terminal state
-                x_new, y_new = self.maze.agent_row, self.maze.agent_col
-                if self.maze.maze[x_new][y_new]["terminal"] == True:
-                    break
+                    # Pause for 3 seconds, and set sleep between each step to 1
+                    sleep(3)
+                    self.set_sleep(1)
 
-            # Update delta with biggest value change of all states
-            flattened_value_changes = [item for sublist in value_changes for item in sublist]
-            delta = max(flattened_value_changes)
+            # Saved after the convergence test, so a resumed game knows whether the next run plays the optimal route
+            if self.checkpoint_path is not None and run % self.checkpoint_every == 0:
+                self.save_checkpoint(self.checkpoint_path)
 
-            if delta < self.epsilon:
-                # Set convergence flag to True and reset probability to 1
-                convergence = True
-                probability = 1
+    def end_play(self, run):
+        """
+        Write the buffered steps of the trajectory log, so the log can be read as soon as autonomous play returns.
+
+        :return: the number of runs played
+        """
+        if self.trajectory_log is not None:
+            self.trajectory_log.flush()
+        return run
 
-                # Visualize convergence and exploration rate
-                self.maze.visualize_convergence()
-                self.maze.visualize_exploration_rate(round(exploration_rate, 2))
+    def threaded_play(self, fps=30, **kwargs):
+        """
+        Play the game autonomously at full speed on a training thread, while the main thread shows
+        the latest state values and agent position in a pygame window at a fixed frame rate.
+        Closing the window stops the training.
 
-                # Pause for 3 seconds, and set sleep between each step to 1
-                sleep(3)
-                self.set_sleep(1)
+        :param fps: frames per second of the renderer
+        :param kwargs: arguments of autonomous_play
+        :return: the number of runs played
+        """
+        from Renderer import Renderer
+
+        render = self.render
+        self.render = False
+        self.maze = None
+        result = {}
+
+        def train():
+            result["runs"] = self.autonomous_play(**kwargs)
+
+        training = threading.Thread(target=train, daemon=True)
+        training.start()
+        try:
+            Renderer(self, fps).run(training)
+        finally:
+            self.stopped = True
+            training.join()
+            self.render = render
+        return result.get("runs")
+
+    def solve(self, method="value_iteration", probability=1):
+        """
+        Solve the maze with a planning solver, instead of playing episodes.
+        The converged values are written into a new maze, which stops on the same epsilon threshold as autonomous_play.
+
+        :param method: "value_iteration" for full sweeps over the grid,
+                       "prioritized_sweeping" to only update states whose values are still changing,
+                       "shortest_path" for an exact search from the terminal states and walls of a deterministic maze,
+                       "stochastic" for expected-value sweeps over a sparse transition model,
+                       or "tiled" for value iteration split over all cores
+        :param probability: probability that the agent takes the chosen action, used by the "stochastic" method
+        :return: a 2D array with the best action of each state, -1 for walls and terminal states
+        """
+        self.maze = self.create_maze()
+        if method == "value_iteration":
+            values, policy = self.solver.value_iteration(self.maze.grid, self.epsilon)
+        elif method == "prioritized_sweeping":
+            self.value_changes = ValueChangeTracker(self.maze.grid.open_mask(), self.epsilon)
+            values, policy = self.solver.prioritized_sweeping(self.maze.grid, self.epsilon, self.value_changes)
+        elif method == "shortest_path":
+            values, policy = self.solver.shortest_path(self.maze.grid)
+        elif method == "tiled":
+            from TiledSolver import TiledSolver
+            values, policy = TiledSolver().value_iteration(self.maze.grid, self.epsilon)
+        elif method == "stochastic":
+            values, policy = self.solver.stochastic_value_iteration(self.maze.grid, probability, self.epsilon)
+        else:
+            raise ValueError(f"Unknown solve method: {method}")
+        self.maze.values[...] = values
+        self.values_version += 1
+        return policy
+
+    def routes(self):
+        """
+        Query the optimal routes from any positions on the current values of the maze, e.g. after autonomous_play
+        or solve, without playing them out. The same Routes object is returned until the maze is replaced,
+        and it only rebuilds the routes after the agent wrote new values (see values_version).
+
+        :return: a Routes object of the current maze
+        """
+        if self.cached_routes is None or self.cached_routes.grid is not self.maze.grid:
+            from Routes import Routes
+            self.cached_routes = Routes(self.maze.grid, self.solver, lambda: self.values_version)
+        return self.cached_routes
 
     def manual_play(self):
-        self.maze = Maze(self.num_rows,self.num_cols,self.cell_size)
+        self.render = True
+        self.maze = self.create_maze()
         self.maze.manual_play()
\ No newline at end of file
@@ -0,0 +1,144 @@
+from Agent import Agent
+from MazeGenerator import MazeGenerator
+from Solver import Solver
+from datetime import datetime, timezone
+from itertools import product
+from multiprocessing import get_context
+from time import perf_counter
+import numpy as np
+import platform
+import resource
+import argparse
+import json
+import sys
+import os
+
+# Maze sizes of the default benchmark, from the default maze size up to 4 million cells
+default_sizes = [6, 50, 200, 1000, 2000]
+
+
+def peak_rss():
+    """
+    :return: the peak resident set size of the current process in bytes
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def run_case(case):
+    """
+    Benchmark one maze size and seed. Every case runs in a fresh process, so its peak memory is measured on its own.
+
+    :param case: a tuple of (size, seed, steps, max_sweeps, convergence_max_size, max_runs)
+    :return: a dict with the results of the case
+    """
+    size, seed, steps, max_sweeps, convergence_max_size, max_runs = case
+    result = {"size": f"{size}x{size}", "cells": size * size, "seed": seed}
+
+    start = perf_counter()
+    grid = MazeGenerator(seed).generate(size, size, "rooms")
+    result["generate_time"] = perf_counter() - start
+    result["open_states"] = int(np.count_nonzero(grid.open_mask()))
+    result["reachable_states"] = int(np.count_nonzero(grid.reachable_mask(grid.start)))
+
+    # Setup of autonomous play: copying the grid and building the value changes tracker, timed with a single step
+    agent = Agent(render=False, grid=grid, seed=seed)
+    start = perf_counter()
+    agent.autonomous_play(probability=0.8, max_steps=1)
+    setup_time = perf_counter() - start
+    result["setup_time"] = setup_time
+
+    # Environment steps per second of headless autonomous play, learning from scratch, without the setup
+    agent = Agent(render=False, grid=grid, seed=seed)
+    start = perf_counter()
+    agent.autonomous_play(probability=0.8, max_steps=steps)
+    wall_time = perf_counter() - start
+    result["steps"] = agent.steps
+    result["steps_per_second"] = (agent.steps - 1) / max(wall_time - setup_time, 1e-9)
+
+    # Sweeps, backups and wall time of vectorized value iteration until the biggest value change is below epsilon
+    solver = Solver()
+    if max_sweeps is not None:
+        solver.max_sweeps = max_sweeps
+    start = perf_counter()
+    values, _ = solver.value_iteration(grid, agent.epsilon)
+    wall_time = perf_counter() - start
+    result["solver_sweeps"] = solver.sweeps
+    result["solver_backups"] = solver.backups
+    result["solver_time"] = wall_time
+    errors = solver.bellman_errors(values, grid.rewards)[grid.open_mask()]
+    result["solver_converged"] = bool(errors.max(initial=0) < agent.epsilon)
+    result["backups_per_second"] = solver.backups / wall_time
+
+    # Episodes and wall time to convergence of autonomous play. Only every reachable state counts towards
+    # convergence, but the agent has to stumble on every one of them while exploring, which takes too long
+    # on all but small mazes.
+    if size <= convergence_max_size:
+        agent = Agent(render=False, grid=grid, seed=seed)
+        start = perf_counter()
+        runs = agent.autonomous_play(probability=0.8, max_runs=max_runs)
+        result["convergence_time"] = perf_counter() - start
+        result["episodes"] = runs
+        result["convergence_steps"] = agent.steps
+        result["converged"] = agent.converged
+
+    result["peak_rss"] = peak_rss()
+    return result
+
+
+def benchmark(sizes, seeds, steps=20000, max_sweeps=None, convergence_max_size=10, max_runs=10000):
+    """
+    Run the benchmark of every maze size and seed, one fresh process per case.
+
+    :param sizes: maze sizes, the mazes have as many rows as columns
+    :param seeds: seeds of the maze generator and of the agent
+    :param steps: number of environment steps to time
+    :param max_sweeps: optional limit on the number of value iteration sweeps, Solver.max_sweeps by default
+    :param convergence_max_size: largest maze size for which the time to convergence is measured
+    :param max_runs: limit on the number of runs to convergence
+    :return: list of dicts, one per case
+    """
+    # Spawned processes don't inherit the memory of this process, which keeps the peak RSS of each case clean
+    context = get_context("spawn")
+    results = []
+    for size, seed in product(sizes, seeds):
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, ((size, seed, steps, max_sweeps, convergence_max_size, max_runs),))
+        print(json.dumps(result))
+        results.append(result)
+    return results
+
+
+def write_results(results, path):
+    """
+    Write the results to a JSON file, together with the software and hardware they were measured on
+    """
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of headless training and planning by maze size")
+    parser.add_argument("--size", type=int, nargs="+", default=default_sizes)
+    parser.add_argument("--seed", type=int, nargs="+", default=[0])
+    parser.add_argument("--steps", type=int, default=20000, help="number of environment steps to time")
+    parser.add_argument("--max-sweeps", type=int, default=None, help="limit on the number of value iteration sweeps")
+    parser.add_argument("--convergence-max-size", type=int, default=10,
+                        help="largest maze size for which the time to convergence is measured")
+    parser.add_argument("--max-runs", type=int, default=10000)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    results = benchmark(args.size, args.seed, args.steps, args.max_sweeps, args.convergence_max_size, args.max_runs)
+    write_results(results, args.output)
+    print(f"Wrote {len(results)} results to {args.output}")
@@ -0,0 +1,125 @@
+from Policy import Policy
+from Grid import Grid, WALL, WATER, ENEMY, FINISH_FLAGS, FINISH_LINE
+
+class Environment:
+    """
+    Headless maze environment. Holds the grid, the agent position and the points earned,
+    and implements the game rules, without importing pygame or loading any images.
+    The Maze class extends it with a pygame window for visualization.
+    """
+    points = 0 # Points the agents earns
+
+    # Define the size of the grid
+    num_rows = 0
+    num_cols = 0
+
+    grid = None
+    maze = None
+
+    # Define the starting position of the agent
+    default_agent_row, default_agent_col = 4,3
+    agent_row, agent_col = default_agent_row, default_agent_col
+
+    policy = Policy()
+
+    def __init__(self, num_rows=6, num_cols=6, grid=None):
+        """
+        :param num_rows: number of rows of the default maze
+        :param num_cols: number of columns of the default maze
+        :param grid: optional Grid with the layout of the maze, e.g. from MazeGenerator or Grid.load.
+                     The grid is used as it is, not copied. Its size replaces num_rows and num_cols.
+        """
+        if grid is None:
+            grid = self.default_grid(num_rows, num_cols)
+
+        self.num_rows = grid.num_rows
+        self.num_cols = grid.num_cols
+
+        # The cells of the maze are stored in NumPy arrays
+        self.grid = grid
+        self.ids = self.grid.ids
+        self.rewards = self.grid.rewards
+        self.terminals = self.grid.terminals
+        self.values = self.grid.values
+
+        # List-of-dicts style access to the cells, e.g. self.maze[row][col]["value"]
+        self.maze = self.grid
+
+        if grid.start is not None:
+            self.default_agent_row, self.default_agent_col = grid.start
+            self.agent_row, self.agent_col = grid.start
+
+
+    def default_grid(self, num_rows, num_cols):
+        """
+        Generate the grid of the default maze, with water, an enemy and two finish lines
+        """
+        grid = Grid(num_rows, num_cols)
+
+        # Water
+        grid.set_cell(2, 4, WATER, -10)
+        grid.set_cell(2, 3, WATER, -10)
+
+        # Enemy
+        grid.set_cell(4, 2, ENEMY, -2)
+
+        # Finish lines
+        grid.set_cell(4, 1, FINISH_FLAGS, 10, terminal=True) # 1st finish with +10 score
+        grid.set_cell(1, 4, FINISH_LINE, 40, terminal=True) # 2nd finish with +40 score
+
+        grid.start = (self.default_agent_row, self.default_agent_col)
+        return grid
+
+
+    def reset(self):
+        """
+        Reset the agent position and the points earned
+        """
+        self.agent_row, self.agent_col = self.default_agent_row, self.default_agent_col
+        self.points = 0
+
+
+    def is_valid_move(self, row, col):
+        """
+        Check if move doesn't cause agent to collide with wall, otherwise agents stays on same state.
+        """
+        return self.ids[row, col] != WALL
+
+
+    def is_terminal(self):
+        """
+        Check if the agent is on a terminal state
+        """
+        return self.terminals[self.agent_row, self.agent_col]
+
+
+    def update_values(self):
+        max_value = self.policy.max_value(self)
+
+        x, y = self.agent_row, self.agent_col
+        if not self.terminals[x, y]:
+            self.values[x, y] = max_value
+
+
+    def step(self, action, convergence=False):
+        """
+        Perform one step in the maze by taking the given action and updating the agent's position.
+        Also updates the amount of points.
+
+        :param action: The action to take (0 = left, 1 = right, 2 = up, 3 = down)
+        :param convergence: A flag indicating if this step is part of convergence testing
+        :return: the reward gained by the step
+        """
+        if action == 0 and self.is_valid_move(self.agent_row, self.agent_col - 1):  # Move left
+            self.agent_col -= 1
+        elif action == 1 and self.is_valid_move(self.agent_row, self.agent_col + 1):  # Move right
+            self.agent_col += 1
+        elif action == 2 and self.is_valid_move(self.agent_row - 1, self.agent_col):  # Move up
+            self.agent_row -= 1
+        elif action == 3 and self.is_valid_move(self.agent_row + 1, self.agent_col):  # Move down
+            self.agent_row += 1
+
+        # Update points with the gained reward
+        reward = int(self.rewards[self.agent_row, self.agent_col])
+        self.points += reward
+        return reward
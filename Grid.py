@@ -0,0 +1,300 @@
+import numpy as np
+import struct
+
+# Cell IDs used throughout the maze
+EMPTY = 0
+WALL = 1
+WATER = 2
+ENEMY = 3
+FINISH_FLAGS = 4
+FINISH_LINE = 5
+
+# Header of memory-mapped grid files: magic, version, rows, columns, start row and start column
+header_format = "<8sIqqqq"
+header_size = 64
+magic = b"MAZEGRID"
+version = 1
+
+
+class Grid():
+    """
+    Array-backed storage of the maze cells.
+    Each cell property (ID, reward, terminal flag and state value) is kept in its own 2D NumPy array,
+    so whole-grid operations can be vectorized and large grids stay compact in memory.
+    Indexing the grid as grid[row][col]["key"] returns a view on a single cell, for code that
+    still expects the old list-of-dicts layout.
+    """
+
+    start = None # Starting position (row, col) of the agent, if the grid defines one
+
+    def __init__(self, num_rows, num_cols):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+
+        shape = (num_rows, num_cols)
+        self.ids = np.full(shape, EMPTY, dtype=np.int8)
+        self.rewards = np.full(shape, -1, dtype=np.int32)
+        self.terminals = np.zeros(shape, dtype=bool)
+        self.values = np.zeros(shape, dtype=np.float64)
+
+        # Outer wall cells
+        self.set_walls(self.border_mask())
+
+    def border_mask(self):
+        """
+        :return: a boolean 2D array which is True on the outer edges of the grid
+        """
+        mask = np.zeros((self.num_rows, self.num_cols), dtype=bool)
+        mask[0, :] = mask[-1, :] = True
+        mask[:, 0] = mask[:, -1] = True
+        return mask
+
+    def set_walls(self, mask):
+        """
+        Turn the cells selected by mask into walls.
+
+        :param mask: a boolean 2D array, or anything else NumPy accepts as an index
+        """
+        self.ids[mask] = WALL
+        self.rewards[mask] = -999
+        self.terminals[mask] = False
+        self.values[mask] = 0
+
+    def set_cell(self, row, col, cell_id, reward, terminal=False):
+        """
+        Set the ID, reward and terminal flag of a single cell.
+        """
+        self.ids[row, col] = cell_id
+        self.rewards[row, col] = reward
+        self.terminals[row, col] = terminal
+
+    def open_mask(self):
+        """
+        :return: a boolean 2D array which is True for every state whose value gets updated (no walls, no terminals)
+        """
+        return (self.ids != WALL) & ~self.terminals
+
+    def reachable_mask(self, start):
+        """
+        Breadth-first search from the starting position over the open states. Terminal states end a run,
+        so the search doesn't pass through them. Every step expands the whole frontier at once.
+
+        :param start: position (row, col) of the agent at the start of every run
+        :return: a boolean 2D array which is True for every open state the agent can reach from start
+        """
+        open_states = self.open_mask().ravel()
+        reachable = np.zeros(open_states.shape, dtype=bool)
+        moves = np.array([-1, 1, -self.num_cols, self.num_cols])
+
+        # The outer walls keep every move inside the grid
+        frontier = np.array([start[0] * self.num_cols + start[1]])
+        frontier = frontier[open_states[frontier]]
+        reachable[frontier] = True
+        while len(frontier):
+            neighbours = np.unique((frontier[:, np.newaxis] + moves).ravel())
+            frontier = neighbours[open_states[neighbours] & ~reachable[neighbours]]
+            reachable[frontier] = True
+        return reachable.reshape(self.num_rows, self.num_cols)
+
+    @classmethod
+    def from_arrays(cls, ids, rewards, terminals, values=None, start=None):
+        """
+        Create a grid around existing cell arrays, without copying them.
+
+        :param values: array of state values, all values start at 0 if not given
+        :return: the new Grid
+        """
+        grid = cls.__new__(cls)
+        grid.num_rows, grid.num_cols = ids.shape
+        grid.ids = ids
+        grid.rewards = rewards
+        grid.terminals = terminals
+        grid.values = values if values is not None else np.zeros(ids.shape, dtype=np.float64)
+        grid.start = start
+        return grid
+
+    def copy(self):
+        """
+        Copy the grid. Read-only arrays, like the layout of a grid opened with open_memmap, can't change
+        and are shared with the new grid instead of copied.
+
+        :return: a new grid with copies of the cell arrays
+        """
+        def copy_array(array):
+            return array if not array.flags.writeable else array.copy()
+
+        return Grid.from_arrays(copy_array(self.ids), copy_array(self.rewards), copy_array(self.terminals),
+                                copy_array(self.values), self.start)
+
+    def save(self, path):
+        """
+        Save the layout of the grid (IDs, rewards, terminal flags and start position) to a compressed .npz file.
+        State values are not saved.
+        """
+        start = self.start if self.start is not None else (-1, -1)
+        np.savez_compressed(path, ids=self.ids, rewards=self.rewards,
+                            terminals=np.packbits(self.terminals), start=np.array(start))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a grid layout saved with Grid.save. All state values start at 0.
+
+        :return: the loaded Grid
+        """
+        with np.load(path) as data:
+            ids = data["ids"].astype(np.int8)
+            rewards = data["rewards"].astype(np.int32)
+            terminals = np.unpackbits(data["terminals"], count=ids.size).reshape(ids.shape).astype(bool)
+            start = tuple(int(i) for i in data["start"])
+        return cls.from_arrays(ids, rewards, terminals, start=start if start != (-1, -1) else None)
+
+    @staticmethod
+    def memmap_offsets(num_rows, num_cols):
+        """
+        Calculate where the arrays of a memory-mapped grid file start. Every array is aligned to 8 bytes.
+
+        :return: a dict with the offset of each array, and the total file size under "size"
+        """
+        num_cells = num_rows * num_cols
+        offsets = {}
+        offset = header_size
+        for name, itemsize in (("ids", 1), ("rewards", 4), ("terminals", 1), ("values", 8)):
+            offsets[name] = offset
+            offset += -(-num_cells * itemsize // 8) * 8
+        offsets["size"] = offset
+        return offsets
+
+    def save_memmap(self, path):
+        """
+        Save the grid, including the state values, to a binary file that can be opened with open_memmap.
+        The file holds a small header, followed by the raw ID, reward, terminal and value arrays.
+        """
+        offsets = self.memmap_offsets(self.num_rows, self.num_cols)
+        start = self.start if self.start is not None else (-1, -1)
+        with open(path, "wb") as file:
+            file.write(struct.pack(header_format, magic, version, self.num_rows, self.num_cols, *start))
+            file.truncate(offsets["size"])
+
+        shape = (self.num_rows, self.num_cols)
+        for name, dtype in (("ids", np.int8), ("rewards", np.int32), ("terminals", bool), ("values", np.float64)):
+            array = np.memmap(path, dtype=dtype, mode="r+", offset=offsets[name], shape=shape)
+            array[...] = getattr(self, name)
+            array.flush()
+            del array
+
+    @classmethod
+    def open_memmap(cls, path, mode="r", values_mode="c"):
+        """
+        Open a grid file written by save_memmap without loading it. The arrays are memory-mapped,
+        so cells are paged in from disk when they are used, and processes that open the same file share its memory.
+
+        :param mode: mode of the layout arrays, "r" for read-only or "r+" to write changes to the file
+        :param values_mode: mode of the state values, "c" for private copy-on-write values,
+                            "r+" to write the values to the file, or "r" for read-only values
+        :return: the Grid
+        """
+        with open(path, "rb") as file:
+            file_magic, file_version, num_rows, num_cols, start_row, start_col = struct.unpack(
+                header_format, file.read(struct.calcsize(header_format)))
+        if file_magic != magic or file_version != version:
+            raise ValueError(f"{path} is not a grid file")
+
+        offsets = cls.memmap_offsets(num_rows, num_cols)
+        shape = (num_rows, num_cols)
+        ids = np.memmap(path, dtype=np.int8, mode=mode, offset=offsets["ids"], shape=shape)
+        rewards = np.memmap(path, dtype=np.int32, mode=mode, offset=offsets["rewards"], shape=shape)
+        terminals = np.memmap(path, dtype=bool, mode=mode, offset=offsets["terminals"], shape=shape)
+        values = np.memmap(path, dtype=np.float64, mode=values_mode, offset=offsets["values"], shape=shape)
+
+        start = (start_row, start_col) if (start_row, start_col) != (-1, -1) else None
+        return cls.from_arrays(ids, rewards, terminals, values, start)
+
+    def nbytes(self):
+        """
+        :return: the number of bytes used by the cell arrays
+        """
+        return self.ids.nbytes + self.rewards.nbytes + self.terminals.nbytes + self.values.nbytes
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, row):
+        return RowView(self, row)
+
+    def __iter__(self):
+        for row in range(self.num_rows):
+            yield RowView(self, row)
+
+
+class RowView():
+    """
+    A single row of the grid, as returned by grid[row].
+    """
+
+    def __init__(self, grid, row):
+        self.grid = grid
+        self.row = row
+
+    def __len__(self):
+        return self.grid.num_cols
+
+    def __getitem__(self, col):
+        return CellView(self.grid, self.row, col)
+
+    def __iter__(self):
+        for col in range(self.grid.num_cols):
+            yield CellView(self.grid, self.row, col)
+
+
+class CellView():
+    """
+    Dict-like view on a single cell, with the keys "id", "reward", "terminal" and "value".
+    Reads and writes go straight to the arrays of the grid.
+    """
+
+    keys = ("id", "reward", "terminal", "value")
+
+    def __init__(self, grid, row, col):
+        self.grid = grid
+        self.row = row
+        self.col = col
+
+    def __getitem__(self, key):
+        index = (self.row, self.col)
+        if key == "id":
+            return int(self.grid.ids[index])
+        if key == "reward":
+            return int(self.grid.rewards[index])
+        if key == "terminal":
+            # Outer walls have no terminal flag
+            if self.grid.ids[index] == WALL:
+                return None
+            return bool(self.grid.terminals[index])
+        if key == "value":
+            return float(self.grid.values[index])
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        index = (self.row, self.col)
+        if key == "id":
+            self.grid.ids[index] = value
+        elif key == "reward":
+            self.grid.rewards[index] = value
+        elif key == "terminal":
+            self.grid.terminals[index] = bool(value)
+        elif key == "value":
+            self.grid.values[index] = value
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return {key: self[key] for key in self.keys} == other
+        return NotImplemented
+
+    def __repr__(self):
+        return repr({key: self[key] for key in self.keys})
@@ -1,14 +1,17 @@
 import pygame
+import numpy as np
 import sys
-from Policy import Policy
+from Environment import Environment
+from Grid import WALL
+from TextCache import TextCache
 from time import sleep
 
-class Maze:
-    points = 0 # Points the agents earns
+class Maze(Environment):
+    """
+    Maze environment with a pygame window, which visualizes the maze, the agent and the learned state values.
+    """
 
-    # Define the size of the grid and the size of each cell
-    num_rows = 0
-    num_cols = 0
+    # Define the size of each cell
     cell_size = 0
 
     # Define the colors to use for elements in the maze
@@ -34,65 +37,66 @@ class Maze:
     screen = None
     font = None # Font of text on cells
     small_font = None
+    text_cache = None # Rendered texts, so strings that don't change aren't rendered every frame
+    value_precision = 1 # Number of decimals of the state values shown on the cells
 
-    maze = []
-    
-    # Define the starting position of the agent
-    default_agent_row, default_agent_col = 4,3
-    agent_row, agent_col = default_agent_row, default_agent_col
+    # Scaled images, shared by all mazes. Keyed by the image and the size it's scaled to
+    scaled_images = {}
 
-    policy = Policy()
+    # Variables for redrawing only the parts of the screen that changed
+    background = None # Static layer with the cells, the roster and the rewards, drawn once
+    drawn_values = None # State values as they are currently shown on the screen
+    drawn_agent = None # Cell of the agent as it is currently shown on the screen
+    overlays = None # Rects of the texts drawn on top of the maze in the current frame
+    dirty_rects = None # Rects of the screen that changed since the last display update
+    offscreen = False # Draw on an in-memory surface instead of a window
 
-    def __init__(self, num_rows=6, num_cols=6, cell_size=150):
-        self.num_rows = num_rows
-        self.num_cols = num_cols
+    def __init__(self, num_rows=6, num_cols=6, cell_size=150, grid=None, offscreen=False):
+        """
+        :param offscreen: draw the maze on an in-memory surface without opening a window, e.g. to record frames
+                          on a server without a display
+        """
+        super().__init__(num_rows, num_cols, grid)
         self.cell_size = cell_size
-
-        # Generate 2D list of maze
-        for i in range(num_rows):
-            row = []
-            for j in range(num_cols):
-                # Outer wall cells
-                if i == 0 or i == num_rows - 1 or j == 0 or j == num_cols - 1:
-                    row.append({"id":1, "reward":-999, "terminal":None, "value":0})
-                else:
-                    # Empty cells
-                    # Contains the following: [cell ID, reward, Terminal, state value]
-                    # The contents are updated
-                    row.append({"id":0, "reward":-1, "terminal":False, "value":0})
-            self.maze.append(row)
-
-        # Water
-        self.maze[2][4]["id"] = 2 # Edit grid cell ID. 2 = water
-        self.maze[2][3]["id"] = 2
-        self.maze[2][4]["reward"] = -10
-        self.maze[2][3]["reward"] = -10
-
-        # Enemy
-        self.maze[4][2]["id"] = 3 # Edit grid cell ID. 3 = enemy
-        self.maze[4][2]["reward"] = -2
-
-        # Finish lines
-        self.maze[4][1]["id"] = 4 # Edit grid cell ID. 4 = 1st finish with +10 score
-        self.maze[1][4]["id"] = 5 # Edit grid cell ID. 5 = 2nd finish with +40 score
-        self.maze[4][1]["reward"] = 10 
-        self.maze[1][4]["reward"] = 40
-        self.maze[4][1]["terminal"] = True
-        self.maze[1][4]["terminal"] = True
-
-        # Create the Pygame window
-        self.width = num_cols * cell_size
-        self.height = num_rows * cell_size
-        pygame.init()
-        self.screen = pygame.display.set_mode((self.width, self.height))
-        pygame.display.set_caption('Grid-Based Maze')
+        self.offscreen = offscreen
+
+        # Create the Pygame window, or a surface of the same size
+        self.width = self.num_cols * cell_size
+        self.height = self.num_rows * cell_size
+        if offscreen:
+            pygame.font.init()
+            self.screen = pygame.Surface((self.width, self.height))
+        else:
+            pygame.init()
+            self.screen = pygame.display.set_mode((self.width, self.height))
+            pygame.display.set_caption('Grid-Based Maze')
 
         # Set fonts for texts that will show on Pygame
         self.font = pygame.font.SysFont('Arial', 22)
         self.small_font = pygame.font.SysFont('Arial', 16)
+        self.text_cache = TextCache()
 
+        self.overlays = []
+        self.dirty_rects = []
 
-    def generate_object(self, x, y, image, size=1.0):
+
+    def scale_image(self, image, width, height):
+        """
+        Scale an image, or take it from the cache if it has been scaled to this size before.
+
+        :return: the scaled image
+        """
+        key = (id(image), int(width), int(height))
+        scaled_image = self.scaled_images.get(key)
+        if scaled_image is None:
+            scaled_image = pygame.transform.scale(image, (int(width), int(height)))
+            if pygame.display.get_surface() is not None:
+                scaled_image = scaled_image.convert_alpha()
+            self.scaled_images[key] = scaled_image
+        return scaled_image
+
+
+    def generate_object(self, x, y, image, size=1.0, surface=None):
 
         """
         Generate objects and show them on the Pygame screen.
@@ -101,54 +105,124 @@ class Maze:
         :param y: y-coordinate of the object's top-left corner
         :param image: image of the object to be displayed
         :param size: size of the object (default: 1/full size)
+        :param surface: surface to draw on (default: the screen)
         """
+        if surface is None:
+            surface = self.screen
 
         center = (x + self.cell_size // 2, y + self.cell_size // 2)
-        image = pygame.transform.scale(image, (self.cell_size * size, self.cell_size * size))
+        image = self.scale_image(image, self.cell_size * size, self.cell_size * size)
         image_rect = image.get_rect()
         image_rect.center = center
-        self.screen.blit(image, image_rect)           
+        surface.blit(image, image_rect)
 
 
-    def draw_maze(self, run=False, exploration_rate=False):
+    def draw_background(self):
         """
-        Draws the maze in the game window with different elements such as cells, walls, water, enemies, finish flags, and finish line.
-        Also, it generates the lines between the cells to create a roster, draws reward at each state, and visualizes the points.
+        Draws the static layer of the maze with different elements such as cells, walls, water, enemies, finish flags, and finish line.
+        Also, it generates the lines between the cells to create a roster and draws the reward at each state.
+        The layer is drawn once, every frame only the parts that changed are copied from it to the screen.
         """
+        self.background = pygame.Surface((self.width, self.height))
         for row in range(self.num_rows):
-            for col in range(self.num_rows):
+            for col in range(self.num_cols):
                 x = col * self.cell_size
                 y = row * self.cell_size
-                if self.maze[row][col]["id"] == 0:
+                cell_id = self.ids[row, col]
+                if cell_id == 0:
                     # Generate normal grid cells
-                    self.generate_object(x, y, self.tile_image)                 
-                if self.maze[row][col]["id"] == 1:
+                    self.generate_object(x, y, self.tile_image, surface=self.background)
+                if cell_id == 1:
                     # Generate black walls on outer edges
-                    pygame.draw.rect(self.screen, self.wall_color, (x, y, self.cell_size, self.cell_size))
-                if self.maze[row][col]["id"] == 2: 
+                    pygame.draw.rect(self.background, self.wall_color, (x, y, self.cell_size, self.cell_size))
+                if cell_id == 2:
                     # Generate water on grid cell
-                    self.generate_object(x, y, self.water_image)
-                if self.maze[row][col]["id"] == 3:
+                    self.generate_object(x, y, self.water_image, surface=self.background)
+                if cell_id == 3:
                     # Generate normal grid cell and enemy ontop
-                    self.generate_object(x, y, self.tile_image) 
-                    self.generate_object(x, y, self.enemy_image, 0.8)
-                if self.maze[row][col]["id"] == 4:
+                    self.generate_object(x, y, self.tile_image, surface=self.background)
+                    self.generate_object(x, y, self.enemy_image, 0.8, surface=self.background)
+                if cell_id == 4:
                     # Generate normal grid cell and finish flags on top
-                    self.generate_object(x, y, self.tile_image) 
-                    self.generate_object(x, y, self.finish_flags_image, 0.6)
-                if self.maze[row][col]["id"] == 5:
+                    self.generate_object(x, y, self.tile_image, surface=self.background)
+                    self.generate_object(x, y, self.finish_flags_image, 0.6, surface=self.background)
+                if cell_id == 5:
                     # Generate normal grid cell and finish line on top
-                    self.generate_object(x, y, self.tile_image) 
-                    self.generate_object(x, y, self.finish_line_image)
+                    self.generate_object(x, y, self.tile_image, surface=self.background)
+                    self.generate_object(x, y, self.finish_line_image, surface=self.background)
 
                 # Draw lines between grid cells, to create a roster
-                pygame.draw.line(self.screen, (0, 0, 0), (x, y), (x + self.cell_size, y), 2)
-                pygame.draw.line(self.screen, (0, 0, 0), (x + self.cell_size, y), (x + self.cell_size, y + self.cell_size), 2)
-                pygame.draw.line(self.screen, (0, 0, 0), (x, y + self.cell_size), (x + self.cell_size, y + self.cell_size), 2)
-                pygame.draw.line(self.screen, (0, 0, 0), (x, y), (x, y + self.cell_size), 2)
+                pygame.draw.line(self.background, (0, 0, 0), (x, y), (x + self.cell_size, y), 2)
+                pygame.draw.line(self.background, (0, 0, 0), (x + self.cell_size, y), (x + self.cell_size, y + self.cell_size), 2)
+                pygame.draw.line(self.background, (0, 0, 0), (x, y + self.cell_size), (x + self.cell_size, y + self.cell_size), 2)
+                pygame.draw.line(self.background, (0, 0, 0), (x, y), (x, y + self.cell_size), 2)
+
+                # Visualize the reward of the state
+                self.visualize_reward(row, col)
+
+
+    def redraw(self):
+        """
+        Forget what is shown on the screen, so the next frame draws the whole maze again.
+        Needed after the layout of the maze has been changed.
+        """
+        self.background = None
+        self.drawn_values = None
+        self.drawn_agent = None
+        self.overlays = []
+
 
-                # Visualize the reward and the value of the state
+    def cell_rect(self, row, col):
+        return pygame.Rect(col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size)
+
+
+    def draw_cell(self, row, col):
+        """
+        Copy a cell from the background to the screen, and draw its state value on top
+        """
+        rect = self.cell_rect(row, col)
+        self.screen.blit(self.background, rect, rect)
+        self.visualize_state_utilities(row, col)
+        self.dirty_rects.append(rect)
+
+
+    def draw_maze(self, run=False, exploration_rate=False):
+        """
+        Draws the maze in the game window. The first frame copies the whole background, after that only the cells
+        whose value changed, the previous cell of the agent and the cells under the texts of the previous frame are redrawn.
+        Also visualizes the points, and optionally the run and the exploration rate.
+        """
+        if self.background is None:
+            self.draw_background()
+
+        if self.drawn_values is None:
+            # First frame, draw everything
+            self.screen.blit(self.background, (0, 0))
+            self.dirty_rects.append(self.screen.get_rect())
+            dirty = self.ids != WALL
+            self.drawn_values = self.values.copy()
+            for row, col in zip(*np.nonzero(dirty)):
                 self.visualize_state_utilities(row, col)
+        else:
+            # Only values that look different on the screen need a redraw
+            dirty = self.format_values(self.values) != self.format_values(self.drawn_values)
+
+            # Remove the texts of the previous frame
+            for rect in self.overlays:
+                self.screen.blit(self.background, rect, rect)
+                self.dirty_rects.append(rect)
+                row_start, row_end = rect.top // self.cell_size, rect.bottom // self.cell_size + 1
+                col_start, col_end = rect.left // self.cell_size, rect.right // self.cell_size + 1
+                dirty[row_start:row_end, col_start:col_end] = True
+
+            # Remove the agent of the previous frame
+            if self.drawn_agent is not None:
+                dirty[self.drawn_agent] = True
+
+            for row, col in zip(*np.nonzero(dirty)):
+                self.draw_cell(row, col)
+            self.drawn_values[dirty] = self.values[dirty]
+        self.overlays = []
 
         # Visualization of the amount of points gathered
         self.visualize_points()
@@ -157,39 +231,73 @@ class Maze:
             self.visualize_run(run)
 
         if exploration_rate:
-            self.visualize_exploration_rate(exploration_rate) 
+            self.visualize_exploration_rate(exploration_rate, update=False)
 
-        # Update display
-        pygame.display.update()       
 
+    def format_values(self, values):
+        """
+        :return: the values rounded to the precision they are shown with on the screen
+        """
+        return np.round(values, self.value_precision)
 
-    def visualize_state_utilities(self, row, col):
+
+    def update_display(self):
+        """
+        Update the parts of the display that changed since the last update
         """
-        Visualize the state value and reward of a non-wall state in the maze.
+        if not self.offscreen:
+            pygame.display.update(self.dirty_rects)
+        self.dirty_rects = []
+
+
+    def draw_text(self, text, center):
+        """
+        Draw a text on top of the maze. It is removed again when the next frame is drawn.
+        """
+        text_rect = text.get_rect(center=center)
+        self.screen.blit(text, text_rect)
+        self.overlays.append(text_rect)
+        self.dirty_rects.append(text_rect)
+
+
+    def visualize_reward(self, row, col):
+        """
+        Visualize the reward of a non-wall state on the background.
         """
         x = col * self.cell_size
         y = row * self.cell_size
-        
-        # Draw reward and state value at each state
-        if self.maze[row][col]["id"] != 1:
-            reward = self.maze[row][col]["reward"]
-            text = self.small_font.render(str(reward), True, (50,205,50))
+
+        if self.ids[row, col] != WALL:
+            reward = self.rewards[row, col]
+            text = self.text_cache.render(self.small_font, str(reward), (50,205,50))
             text_rect = text.get_rect(center=(x+self.cell_size//7, y+self.cell_size//7))
-            self.screen.blit(text, text_rect)
+            self.background.blit(text, text_rect)
 
-            value = self.maze[row][col]["value"]
-            text = self.font.render("V = "+str(value), True, self.reward_color)
+
+    def visualize_state_utilities(self, row, col):
+        """
+        Visualize the state value of a non-wall state in the maze. The text is clipped to the cell,
+        so that redrawing the cell removes it completely.
+        """
+        x = col * self.cell_size
+        y = row * self.cell_size
+        
+        # Draw state value at each state
+        if self.ids[row, col] != WALL:
+            value = self.values[row, col]
+            text = self.text_cache.render(self.font, f"V = {value:.{self.value_precision}f}", self.reward_color)
             text_rect = text.get_rect(center=(x+self.cell_size//2, y+self.cell_size//2))
+            self.screen.set_clip(self.cell_rect(row, col))
             self.screen.blit(text, text_rect)
+            self.screen.set_clip(None)
 
 
     def visualize_points(self):
         """
         Display number representing the points earned
         """       
-        text = self.font.render("Points: " + str(self.points), True, (0,255,127))
-        text_rect = text.get_rect(center=(0+self.cell_size//2, 0+self.cell_size//2))
-        self.screen.blit(text, text_rect)
+        text = self.text_cache.render(self.font, "Points: " + str(self.points), (0,255,127))
+        self.draw_text(text, (0+self.cell_size//2, 0+self.cell_size//2))
     
 
     def visualize_run(self, run):
@@ -197,34 +305,37 @@ class Maze:
         Display number representing the current r un
         """        
         # Visualization of the amount of points gathered
-        text = self.font.render("Run: " + str(run), True, (138,43,226))
-        text_rect = text.get_rect(center=(self.cell_size//2, 0.2*self.cell_size+self.cell_size//2))
-        self.screen.blit(text, text_rect)      
+        text = self.text_cache.render(self.font, "Run: " + str(run), (138,43,226))
+        self.draw_text(text, (self.cell_size//2, 0.2*self.cell_size+self.cell_size//2))
 
 
-    def visualize_convergence(self):
+    def visualize_convergence(self, update=True):
         """
         Display text that notifies if convergence has been reached
+
+        :param update: whether to update the display right away
         """
         message = "Reached convergence! Showing optimal route"
-        text = self.font.render(message, True, (138,43,226))
-        text_rect = text.get_rect(center=(self.num_cols/2.4*self.cell_size+self.cell_size//2, 0+self.cell_size//2))
-        self.screen.blit(text, text_rect)
+        text = self.text_cache.render(self.font, message, (138,43,226))
+        self.draw_text(text, (self.num_cols/2.4*self.cell_size+self.cell_size//2, 0+self.cell_size//2))
 
         # Update display
-        pygame.display.update()
+        if update:
+            self.update_display()
 
-    def visualize_exploration_rate(self, exploration_rate):
+    def visualize_exploration_rate(self, exploration_rate, update=True):
         """
        Display number representing the exploration rate
+
+        :param update: whether to update the display right away
         """
-        text = self.font.render("Exploration rate: " + str(exploration_rate), True, (138,43,226))
-        text_rect = text.get_rect(center=((self.num_cols-1.5)*self.cell_size+self.cell_size//2, \
-                                          0.4*self.cell_size+self.cell_size//2))
-        self.screen.blit(text, text_rect)
+        text = self.text_cache.render(self.font, "Exploration rate: " + str(exploration_rate), (138,43,226))
+        self.draw_text(text, ((self.num_cols-1.5)*self.cell_size+self.cell_size//2, \
+                              0.4*self.cell_size+self.cell_size//2))
 
         # Update display
-        pygame.display.update()        
+        if update:
+            self.update_display()
 
     
     def generate_agent(self):
@@ -235,50 +346,34 @@ class Maze:
         y = self.agent_row * self.cell_size
 
         center = (x + self.cell_size // 2, y + self.cell_size // 2)
-        image = pygame.transform.scale(self.agent_image, (self.cell_size//2, self.cell_size//1.9))
+        image = self.scale_image(self.agent_image, self.cell_size//2, self.cell_size//1.9)
         image_rect = image.get_rect()
         image_rect.center = center
         self.screen.blit(image, image_rect)
-
-        # Update the display
-        pygame.display.update()        
+        self.dirty_rects.append(image_rect)
+        self.drawn_agent = (self.agent_row, self.agent_col)
 
 
     def generate_maze(self, reset=False, run=False, exploration_rate=False):
         """
-        Generates and displays the maze and the agent.
+        Generates and displays the maze and the agent, with a single update of the parts of the display that changed.
 
         :param reset: a boolean indicating whether to reset the agent position and points earned
         :param run: None or a number representing the current run
         """        
         if reset:
-            self.agent_row, self.agent_col = self.default_agent_row, self.default_agent_col
-            self.points = 0
+            self.reset()
         self.draw_maze(run, exploration_rate)
         self.generate_agent()
+        self.update_display()
         
  
 
-    def is_valid_move(self, row, col):
-        """
-        Check if move doesn't cause agent to collide with wall, otherwise agents stays on same state.
-        """
-        return self.maze[row][col]["id"] != 1
-
-
     def shut_down(self):
         pygame.quit()
         sys.exit()
     
 
-    def update_values(self):
-        max_value, _ = self.policy.select_action(self)
-        
-        x, y = self.agent_row, self.agent_col             
-        if self.maze[x][y]["terminal"] == False:
-            self.maze[x][y]["value"] = max_value         
-
-
     def step(self, action, convergence=False):
         """
         Perform one step in the maze by taking the given action and updating the agent's position.
@@ -286,38 +381,25 @@ class Maze:
 
         :param action: The action to take (0 = left, 1 = right, 2 = up, 3 = down)
         :param convergence: A flag indicating if this step is part of convergence testing
+        :return: the reward gained by the step
         """        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                print(f"Terminating game. Total points: {self.points}!")
-                self.shut_down()
-        if action == 0 and self.is_valid_move(self.agent_row, self.agent_col - 1):  # Move left
-            self.agent_col -= 1
-            # print("Moved left")
-        elif action == 1 and self.is_valid_move(self.agent_row, self.agent_col + 1):  # Move right
-            self.agent_col += 1
-            # print("Moved right")
-        elif action == 2 and self.is_valid_move(self.agent_row - 1, self.agent_col):  # Move up
-            self.agent_row -= 1
-            # print("Moved up")
-        elif action == 3 and self.is_valid_move(self.agent_row + 1, self.agent_col):  # Move down
-            self.agent_row += 1       
-            # print("Moved down")
-
-        # Update points with the gained reward
-        reward = self.maze[self.agent_row][self.agent_col]["reward"]
-        self.points += reward
-        # print(f"Gained reward of {reward} points\n")
+        if not self.offscreen:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    print(f"Terminating game. Total points: {self.points}!")
+                    self.shut_down()
+        reward = super().step(action)
 
         if convergence:
             self.visualize_convergence()
 
         # End program if convergence and we reach terminal state
-        if convergence and self.maze[self.agent_row][self.agent_col]["terminal"] == True:
+        if convergence and self.terminals[self.agent_row, self.agent_col]:
             print(f"Reached finish line with total points of {self.points}!")
             self.generate_maze()
             sleep(3)
             self.shut_down()
+        return reward
 
 
     # For manual testing of the game using keyboard |w,a,s,d| or |up,down,left,right| keys
@@ -351,7 +433,7 @@ class Maze:
                             self.agent_col += 1  
 
                     # Update points with the reward
-                    reward = self.maze[self.agent_row][self.agent_col]["reward"]
+                    reward = int(self.rewards[self.agent_row, self.agent_col])
                     self.points += reward
                     print(f"Gained reward of {reward} points")
 
@@ -359,6 +441,6 @@ class Maze:
                     self.generate_maze()
 
                     # If terminal state reached
-                    if self.maze[self.agent_row][self.agent_col]["terminal"] == True:
+                    if self.terminals[self.agent_row, self.agent_col]:
                         print(f"Reached finish line with total points of {self.points}!")
                         # self.shut_down()
\ No newline at end of file
@@ -0,0 +1,154 @@
+import numpy as np
+from Grid import Grid, EMPTY, WATER, ENEMY, FINISH_FLAGS, FINISH_LINE
+
+class MazeGenerator():
+    """
+    Seeded procedural generator of maze layouts. All layouts are built with vectorized NumPy operations,
+    so mazes of millions of cells are generated in seconds. Rows and columns don't have to be equal.
+    """
+
+    # Rewards of the objects that are placed in the maze
+    water_reward = -10
+    enemy_reward = -2
+    finish_rewards = (10, 40) # Rewards of the 1st (finish flags) and 2nd (finish line) finish
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def random_walls(self, num_rows, num_cols, wall_density=0.2):
+        """
+        Generate an open maze with randomly scattered walls.
+        Parts of the maze may be closed off by walls, so not every state can reach a finish.
+
+        :param wall_density: chance of each inner cell to be a wall
+        :return: a Grid without objects, see place_objects
+        """
+        grid = Grid(num_rows, num_cols)
+        walls = self.rng.random((num_rows, num_cols)) < wall_density
+        grid.set_walls(walls)
+        return grid
+
+    def corridors(self, num_rows, num_cols):
+        """
+        Generate a perfect maze of one cell wide corridors with the binary tree algorithm:
+        cells on odd rows and columns are open, and each of them carves a passage either up or right.
+        Every open cell can reach every other open cell.
+
+        :return: a Grid without objects, see place_objects
+        """
+        grid = Grid(num_rows, num_cols)
+        grid.set_walls(slice(None))
+
+        # Open cells on odd rows and columns
+        rows = np.arange(1, num_rows - 1, 2)
+        cols = np.arange(1, num_cols - 1, 2)
+        grid.ids[np.ix_(rows, cols)] = EMPTY
+
+        # Carve up, except on the top row, or right, except on the last column
+        up = self.rng.random((len(rows), len(cols))) < 0.5
+        up[0, :] = False
+        up[1:, -1] = True
+        right = ~up
+        right[0, -1] = False
+
+        up_rows, up_cols = np.nonzero(up)
+        grid.ids[rows[up_rows] - 1, cols[up_cols]] = EMPTY
+        right_rows, right_cols = np.nonzero(right)
+        grid.ids[rows[right_rows], cols[right_cols] + 1] = EMPTY
+
+        grid.rewards[grid.ids == EMPTY] = -1
+        return grid
+
+    def rooms(self, num_rows, num_cols, num_rooms=None, min_size=3, max_size=10):
+        """
+        Generate a corridor maze with rectangular rooms carved out of it.
+        As rooms only remove walls, every open cell can still reach every other open cell.
+
+        :param num_rooms: number of rooms (default: one per 200 cells)
+        :param min_size: minimum height and width of a room
+        :param max_size: maximum height and width of a room
+        :return: a Grid without objects, see place_objects
+        """
+        grid = self.corridors(num_rows, num_cols)
+        if num_rooms is None:
+            num_rooms = max(1, num_rows * num_cols // 200)
+
+        heights = self.rng.integers(min_size, max_size + 1, num_rooms)
+        widths = self.rng.integers(min_size, max_size + 1, num_rooms)
+        tops = self.rng.integers(1, np.maximum(2, num_rows - 1 - heights))
+        lefts = self.rng.integers(1, np.maximum(2, num_cols - 1 - widths))
+
+        # Carve the rooms, keeping the outer walls
+        rooms = np.zeros((num_rows, num_cols), dtype=bool)
+        for top, left, height, width in zip(tops, lefts, heights, widths):
+            rooms[top:top + height, left:left + width] = True
+        rooms &= ~grid.border_mask()
+        grid.ids[rooms] = EMPTY
+        grid.rewards[rooms] = -1
+        return grid
+
+    def place_objects(self, grid, water_density=0.05, enemy_density=0.01, num_finishes=2):
+        """
+        Place water, enemies, finishes and the starting position of the agent on random open cells of a grid.
+        Finishes alternate between the finish flags and the finish line, with the rewards of finish_rewards.
+        Finishes are only placed on cells the start can reach, but a finish can cut off the cells behind it
+        from the start, see Grid.reachable_mask.
+
+        :param grid: the Grid to place the objects on, it is changed in place
+        :param water_density: fraction of the open cells that become water
+        :param enemy_density: fraction of the open cells that get an enemy
+        :param num_finishes: number of terminal states
+        :return: the Grid
+        """
+        open_cells = np.flatnonzero(grid.ids == EMPTY)
+
+        # Draw the start first, and the finishes from the open cells it can reach, so every run can end.
+        # Random walls can close the start off in a pocket of its own, then another start is drawn.
+        for start in self.rng.permutation(open_cells):
+            reachable = grid.reachable_mask(np.unravel_index(start, grid.ids.shape)).ravel()
+            reachable[start] = False
+            if reachable.any():
+                break
+        else:
+            raise ValueError("The grid has no two connected open cells to place a start and a finish")
+
+        reachable_cells = np.flatnonzero(reachable)
+        finishes = self.rng.choice(reachable_cells, min(num_finishes, len(reachable_cells)), replace=False)
+
+        # Water and enemies on the other open cells
+        other_cells = np.setdiff1d(open_cells, np.concatenate(([start], finishes)), assume_unique=True)
+        num_water = int(water_density * len(open_cells))
+        num_enemies = int(enemy_density * len(open_cells))
+        cells = self.rng.choice(other_cells, min(len(other_cells), num_water + num_enemies), replace=False)
+        enemies, water = cells[:num_enemies], cells[num_enemies:]
+
+        grid.ids.flat[water] = WATER
+        grid.rewards.flat[water] = self.water_reward
+        grid.ids.flat[enemies] = ENEMY
+        grid.rewards.flat[enemies] = self.enemy_reward
+
+        finish_ids = np.resize([FINISH_FLAGS, FINISH_LINE], len(finishes))
+        grid.ids.flat[finishes] = finish_ids
+        grid.rewards.flat[finishes] = np.where(finish_ids == FINISH_FLAGS, *self.finish_rewards)
+        grid.terminals.flat[finishes] = True
+
+        grid.start = tuple(int(i) for i in np.unravel_index(start, grid.ids.shape))
+        return grid
+
+    def generate(self, num_rows, num_cols, kind="rooms", **kwargs):
+        """
+        Generate a maze layout with objects.
+
+        :param kind: "random_walls", "corridors" or "rooms"
+        :param kwargs: arguments of place_objects
+        :return: the generated Grid
+        """
+        if kind == "random_walls":
+            grid = self.random_walls(num_rows, num_cols)
+        elif kind == "corridors":
+            grid = self.corridors(num_rows, num_cols)
+        elif kind == "rooms":
+            grid = self.rooms(num_rows, num_cols)
+        else:
+            raise ValueError(f"Unknown maze kind: {kind}")
+        return self.place_objects(grid, **kwargs)
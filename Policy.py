@@ -1,10 +1,84 @@
 import numpy as np
+import json
 
 class Policy():
+    """
+    Epsilon-greedy action selection. The policy owns a seeded NumPy random number generator, from which
+    uniform random numbers are drawn in large blocks and handed out one per decision,
+    so selecting an action allocates no arrays and a game is reproducible from its seed.
+    """
+
+    block_size = 4096 # Number of random numbers drawn from the generator at once
+
+    def __init__(self, seed=None, block_size=4096):
+        """
+        :param seed: seed of the random number generator, a random seed is used if not given
+        :param block_size: number of random numbers drawn from the generator at once
+        """
+        self.block_size = block_size
+        self.action_values = [0.0] * 4 # Reused for the values of the four actions
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """
+        Restart the random number generator from a seed, and throw away the random numbers drawn so far.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.uniforms = np.empty(self.block_size)
+        self.position = self.block_size
+
+    def uniform(self):
+        """
+        :return: the next random number between 0 and 1 of the current block, drawing a new block when it is used up
+        """
+        if self.position == self.block_size:
+            self.rng.random(out=self.uniforms)
+            self.position = 0
+        number = self.uniforms.item(self.position)
+        self.position += 1
+        return number
+
+    def get_state(self):
+        """
+        :return: a dict of arrays with the state of the generator and the current block, e.g. for a checkpoint
+        """
+        return {"rng": np.array(json.dumps(self.rng.bit_generator.state)), "rng_block": self.uniforms.copy(),
+                "rng_position": np.array(self.position)}
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state, so the policy continues with the same random numbers.
+        """
+        self.rng.bit_generator.state = json.loads(str(state["rng"]))
+        self.uniforms = np.array(state["rng_block"], dtype=np.float64)
+        self.block_size = len(self.uniforms)
+        self.position = int(state["rng_position"])
+
+    def next_values(self, maze):
+        """
+        Calculate reward + value of the next state of each action from the current state of the agent.
+
+        :return: a list with the values of the four actions (left, right, up, down), which is reused by the next call
+        """
+        x, y = maze.agent_row, maze.agent_col
+        rewards, values = maze.rewards.item, maze.values.item
+
+        action_values = self.action_values
+        action_values[0] = rewards(x, y - 1) + values(x, y - 1)
+        action_values[1] = rewards(x, y + 1) + values(x, y + 1)
+        action_values[2] = rewards(x - 1, y) + values(x - 1, y)
+        action_values[3] = rewards(x + 1, y) + values(x + 1, y)
+        return action_values
+
+    def max_value(self, maze):
+        """
+        :return: the value of the best next state, without drawing any random numbers
+        """
+        return max(self.next_values(maze))
 
     def select_action(self, maze, probability=1.0, exploration_rate=0.0, random_agent=False):
         """
-        Select an action for the agent based on the current state of the maze, 
+        Select an action for the agent based on the current state of the maze,
         using an epsilon-greedy algorithm with a specified exploration rate.
         Exploration rate is a percentage, representing the chance of taking a random action to explore.
 
@@ -14,33 +88,78 @@ class Policy():
         :param random_agent: whether or not the agent is random (default: False)
         :return: a tuple containing the value of the best next state, and the action towards that state
         """
+        values = self.next_values(maze)
+        return max(values), self.choose_action(values, probability, exploration_rate, random_agent)
+
+    def choose_action(self, values, probability=1.0, exploration_rate=0.0, random_agent=False):
+        """
+        Pick an action from the values of the four actions, with the same epsilon-greedy algorithm as select_action.
+        Agents that don't read the rewards and values of the maze, like QLearner, use it with their own action values.
+
+        :param values: the value of each action (left, right, up, down)
+        :return: the action to take
+        """
+        if random_agent or self.uniform() < exploration_rate:
+            # Take a random action
+            return int(self.uniform() * 4)
+
+        # In case there are multiple best actions with equal values, pick a random one of them.
+        # Values are converted to Python floats, as NumPy booleans of a Q-table row don't add up to a count.
+        v0, v1, v2, v3 = float(values[0]), float(values[1]), float(values[2]), float(values[3])
+        max_value = max(v0, v1, v2, v3)
+        num_max = (v0 == max_value) + (v1 == max_value) + (v2 == max_value) + (v3 == max_value)
 
-        x, y = [maze.agent_row, maze.agent_col]
+        # Pick best action within probability, otherwise take a random action besides the best action.
+        # When all actions are equally good, there is no other action to take.
+        is_best = True
+        if num_max < 4 and self.uniform() >= probability:
+            is_best = False
+            num_max = 4 - num_max
 
-        values = np.zeros(4)
-        for i, (dx, dy) in enumerate([(0,-1), (0,1), (-1,0), (1,0)]):
-            next_value = maze.maze[x+dx][y+dy]["reward"] + maze.maze[x+dx][y+dy]["value"]
-            values[i] = next_value
+        # Count down to the chosen one among the best actions, or among the other actions
+        choice = int(self.uniform() * num_max)
+        last_action = 0
+        for action, value in enumerate((v0, v1, v2, v3)):
+            if (value == max_value) == is_best:
+                if choice == 0:
+                    return action
+                choice -= 1
+                last_action = action
 
-        max_value = max(values)
+        # Only reached when the values can't be compared, e.g. NaN, never return no action
+        return last_action
+
+    def select_actions(self, env, probability=1.0, exploration_rate=0.0, random_agent=False):
+        """
+        Select the actions of all agents of a VectorEnvironment at once, with the same epsilon-greedy
+        algorithm as select_action. Ties between best actions and the stochastic choice of a non-best action
+        are resolved with random keys, so no Python loop over the agents is needed.
+
+        :param env: the VectorEnvironment
+        :param probability: probability of selecting the best action based on value (default: 1.0)
+        :param exploration_rate: probability of selecting a random action, a single number or one per agent (default: 0.0)
+        :param random_agent: whether or not the agents are random (default: False)
+        :return: a tuple containing the values of the best next states, and the actions of all agents
+        """
+        values = env.next_values()
+        max_values = values.max(axis=1)
+        random_actions = self.rng.integers(4, size=env.num_envs)
 
         if random_agent:
-            # Take a random action
-            next_action = np.random.choice([0, 1, 2, 3])
-        else:
-            if np.random.rand() < exploration_rate:
-                # Take a random action
-                next_action = np.random.choice([0, 1, 2, 3])
-            else:
-                # In case there are multiple best actions with equal values, 
-                # put them all in list and pick random one
-                max_indices = np.where(values == np.max(values))[0]
-
-                # Pick best action of within probability
-                if np.random.rand() < probability:
-                    next_action = np.random.choice(max_indices)
-                else:
-                    # Take a random action, besides the best action
-                    non_max_indices = [i for i in [0, 1, 2, 3] if i not in max_indices]
-                    next_action = np.random.choice(non_max_indices)
-        return max_value, next_action
\ No newline at end of file
+            # Take random actions
+            return max_values, random_actions
+
+        # Pick a random one among the best actions, and among the other actions, using random keys
+        is_max = values == max_values[:, np.newaxis]
+        keys = self.rng.random((env.num_envs, 4))
+        best_actions = np.argmax(np.where(is_max, keys, -1), axis=1)
+        non_best_actions = np.argmax(np.where(is_max, -1, keys), axis=1)
+
+        # Pick best action within probability, otherwise take a random action besides the best action
+        slip = (self.rng.random(env.num_envs) >= probability) & ~is_max.all(axis=1)
+        next_actions = np.where(slip, non_best_actions, best_actions)
+
+        # Take a random action to explore
+        explore = self.rng.random(env.num_envs) < exploration_rate
+        next_actions = np.where(explore, random_actions, next_actions)
+        return max_values, next_actions
@@ -0,0 +1,114 @@
+from time import perf_counter_ns
+import json
+
+class Profiler():
+    """
+    Per-phase timing of the autonomous play loop. The loop calls tick(phase) at the end of every phase,
+    which attributes the time since the previous tick to that phase. Every phase keeps a count, a total time
+    and a histogram of its durations in power-of-two buckets of nanoseconds.
+    After every run the statistics of that run are passed to the callback and appended to the episode file, if set.
+    """
+
+    # Phases of the autonomous play loop
+    phases = ("update_values", "select_action", "step", "track", "render", "sleep")
+    num_buckets = 64 # Bucket i of a histogram counts the durations d with 2^(i-1) <= d < 2^i nanoseconds
+
+    def __init__(self, callback=None, episode_path=None):
+        """
+        :param callback: optional function called after every run with the run number and the statistics of the run
+        :param episode_path: optional file to which the statistics of every run are appended, one JSON object per line
+        """
+        self.callback = callback
+        self.episode_path = episode_path
+        self.counts = {phase: 0 for phase in self.phases}
+        self.totals = {phase: 0 for phase in self.phases}
+        self.histograms = {phase: [0] * self.num_buckets for phase in self.phases}
+        self.episode_counts = dict(self.counts)
+        self.episode_totals = dict(self.totals)
+        self.episode_histograms = {phase: list(histogram) for phase, histogram in self.histograms.items()}
+        self.last = perf_counter_ns()
+
+    def start(self):
+        """
+        Restart the clock, so the time since the last tick isn't attributed to any phase
+        """
+        self.last = perf_counter_ns()
+
+    def tick(self, phase):
+        """
+        Attribute the time since the previous tick to the given phase.
+        """
+        now = perf_counter_ns()
+        elapsed = now - self.last
+        self.last = now
+        self.counts[phase] += 1
+        self.totals[phase] += elapsed
+        self.histograms[phase][min(elapsed.bit_length(), self.num_buckets - 1)] += 1
+
+    def stats(self, counts=None, totals=None, histograms=None):
+        """
+        :return: a dict with the count, total seconds, mean seconds and histogram of every phase,
+                 where the histogram maps the upper bound of each non-empty bucket in nanoseconds to its count
+        """
+        counts = self.counts if counts is None else counts
+        totals = self.totals if totals is None else totals
+        histograms = self.histograms if histograms is None else histograms
+        stats = {}
+        for phase in self.phases:
+            count, total = counts[phase], totals[phase]
+            stats[phase] = {"count": count, "total": total / 1e9, "mean": total / 1e9 / count if count else 0.0,
+                            "histogram": {2 ** i: n for i, n in enumerate(histograms[phase]) if n}}
+        return stats
+
+    def end_episode(self, run):
+        """
+        Pass the statistics of the run that just ended to the callback and the episode file.
+        """
+        counts = {phase: self.counts[phase] - self.episode_counts[phase] for phase in self.phases}
+        totals = {phase: self.totals[phase] - self.episode_totals[phase] for phase in self.phases}
+        histograms = {phase: [n - old_n for n, old_n in zip(self.histograms[phase], self.episode_histograms[phase])]
+                      for phase in self.phases}
+        self.episode_counts = dict(self.counts)
+        self.episode_totals = dict(self.totals)
+        self.episode_histograms = {phase: list(histogram) for phase, histogram in self.histograms.items()}
+
+        stats = self.stats(counts, totals, histograms)
+        if self.callback is not None:
+            self.callback(run, stats)
+        if self.episode_path is not None:
+            with open(self.episode_path, "a") as file:
+                file.write(json.dumps({"run": run, "phases": stats}) + "\n")
+        self.start()
+
+    def dump(self, path):
+        """
+        Write the statistics of all runs so far, including the histograms, to a JSON file.
+        """
+        with open(path, "w") as file:
+            json.dump(self.stats(), file, indent=2)
+
+    def report(self):
+        """
+        :return: a table with the share of the total time spent in every phase
+        """
+        total = sum(self.totals.values()) or 1
+        lines = [f"{'phase':<14}{'count':>10}{'total (s)':>12}{'mean (us)':>12}{'share':>8}"]
+        for phase, stats in self.stats().items():
+            lines.append(f"{phase:<14}{stats['count']:>10}{stats['total']:>12.3f}{stats['mean'] * 1e6:>12.2f}"
+                         f"{self.totals[phase] / total:>8.1%}")
+        return "\n".join(lines)
+
+
+class NullProfiler():
+    """
+    Profiler that does nothing, used by default so the autonomous play loop pays only for empty method calls.
+    """
+
+    def start(self):
+        pass
+
+    def tick(self, phase):
+        pass
+
+    def end_episode(self, run):
+        pass
@@ -0,0 +1,159 @@
+import numpy as np
+import json
+
+class QLearner():
+    """
+    Model-free tabular learner, for mazes whose rewards can't be read by the agent.
+    Action values are kept in a contiguous Q-table with one row per state (row * number of columns + col)
+    and one column per action (left, right, up, down). Every transition the agent experiences is written
+    into a preallocated ring buffer, and the Q-table is updated from minibatches of that buffer with
+    vectorized NumPy operations.
+    """
+
+    method = "q_learning" # "q_learning" bootstraps from the best next action, "sarsa" from the next action taken
+    learning_rate = 0.5
+    learning_rate_decay = 0.1 # The step size of a state and action is learning_rate / (1 + learning_rate_decay * updates)
+    discount = 1.0 # Rewards are not discounted, just like the state values of Agent
+    buffer_size = 10000 # Number of transitions kept in the replay buffer
+    batch_size = 32 # Number of transitions per update, including the newest transition
+
+    def __init__(self, num_rows, num_cols, method="q_learning", learning_rate=0.5, learning_rate_decay=0.1,
+                 discount=1.0, buffer_size=10000, batch_size=32, seed=None):
+        """
+        :param seed: seed of the random number generator that samples the minibatches
+        :param learning_rate_decay: slows down the updates of often updated actions, so the noise of exploration
+                                    fades out and the value changes drop below epsilon. SARSA needs it to converge,
+                                    as it learns the values of the exploring policy itself.
+        """
+        if method not in ("q_learning", "sarsa"):
+            raise ValueError(f"Unknown learning method: {method}")
+
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.method = method
+        self.learning_rate = learning_rate
+        self.learning_rate_decay = learning_rate_decay
+        self.discount = discount
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+
+        self.q_values = np.zeros((num_rows * num_cols, 4), dtype=np.float64)
+        self.updates = np.zeros(num_rows * num_cols * 4, dtype=np.int64) # Number of updates of each action value
+
+        # Ring buffer of transitions, position is where the next transition is written
+        self.states = np.zeros(buffer_size, dtype=np.int64)
+        self.actions = np.zeros(buffer_size, dtype=np.int8)
+        self.rewards = np.zeros(buffer_size, dtype=np.float64)
+        self.next_states = np.zeros(buffer_size, dtype=np.int64)
+        self.next_actions = np.zeros(buffer_size, dtype=np.int8)
+        self.dones = np.zeros(buffer_size, dtype=bool)
+        self.position = 0
+        self.size = 0
+
+
+    def state(self, row, col):
+        """
+        :return: the index of the state at (row, col) in the Q-table
+        """
+        return row * self.num_cols + col
+
+
+    def add(self, state, action, reward, next_state, done, next_action=0):
+        """
+        Write a transition into the replay buffer, overwriting the oldest transition when it is full.
+
+        :param done: whether the next state is a terminal state, which has no value to bootstrap from
+        :param next_action: the action taken from the next state, only used by SARSA
+        """
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.next_actions[i] = next_action
+        self.dones[i] = done
+        self.position = (i + 1) % self.buffer_size
+        self.size = min(self.size + 1, self.buffer_size)
+
+
+    def sample(self):
+        """
+        Sample a minibatch of transitions from the replay buffer. The newest transition is always part of it,
+        so the state the agent just left is updated right away.
+
+        :return: array of buffer indices
+        """
+        newest = (self.position - 1) % self.buffer_size
+        others = self.rng.integers(self.size, size=min(self.batch_size, self.size) - 1)
+        return np.concatenate(([newest], others))
+
+
+    def learn(self):
+        """
+        Update the Q-table with one minibatch from the replay buffer.
+        Transitions of the same state and action in one batch are averaged, instead of applied on top of each other.
+
+        :return: a tuple of the unique updated states, and the absolute change of their best action value
+        """
+        batch = self.sample()
+        states, actions = self.states[batch], self.actions[batch]
+        next_states = self.next_states[batch]
+
+        if self.method == "q_learning":
+            next_values = self.q_values[next_states].max(axis=1)
+        else:
+            next_values = self.q_values[next_states, self.next_actions[batch]]
+        targets = self.rewards[batch] + self.discount * np.where(self.dones[batch], 0, next_values)
+        errors = targets - self.q_values[states, actions]
+
+        # Average the errors of duplicate (state, action) pairs
+        pairs, inverse = np.unique(states * 4 + actions, return_inverse=True)
+        mean_errors = np.bincount(inverse, weights=errors) / np.bincount(inverse)
+
+        updated_states = np.unique(states)
+        old_values = self.q_values[updated_states].max(axis=1)
+        step_sizes = self.learning_rate / (1 + self.learning_rate_decay * self.updates[pairs])
+        self.q_values.reshape(-1)[pairs] += step_sizes * mean_errors
+        self.updates[pairs] += 1
+        new_values = self.q_values[updated_states].max(axis=1)
+        return updated_states, np.abs(new_values - old_values)
+
+
+    def get_state(self):
+        """
+        :return: a dict of arrays with everything the learner learned and the state of its random number generator,
+                 including the update counts and the replay buffer, e.g. for a checkpoint
+        """
+        return {"q_values": self.q_values, "learner_updates": self.updates,
+                "learner_rng": np.array(json.dumps(self.rng.bit_generator.state)),
+                "buffer_states": self.states, "buffer_actions": self.actions, "buffer_rewards": self.rewards,
+                "buffer_next_states": self.next_states, "buffer_next_actions": self.next_actions,
+                "buffer_dones": self.dones, "buffer_position": np.array(self.position),
+                "buffer_size": np.array(self.size)}
+
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state, so the learner continues exactly where it was.
+        """
+        self.q_values[...] = state["q_values"]
+        self.updates[...] = state["learner_updates"]
+        self.rng.bit_generator.state = json.loads(str(state["learner_rng"]))
+
+        self.states = np.array(state["buffer_states"], dtype=np.int64)
+        self.actions = np.array(state["buffer_actions"], dtype=np.int8)
+        self.rewards = np.array(state["buffer_rewards"], dtype=np.float64)
+        self.next_states = np.array(state["buffer_next_states"], dtype=np.int64)
+        self.next_actions = np.array(state["buffer_next_actions"], dtype=np.int8)
+        self.dones = np.array(state["buffer_dones"], dtype=bool)
+        self.buffer_size = len(self.states)
+        self.position = int(state["buffer_position"])
+        self.size = int(state["buffer_size"])
+
+
+    def state_values(self, states):
+        """
+        :return: the value of the best action of each given state
+        """
+        return self.q_values[states].max(axis=1)
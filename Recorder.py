@@ -0,0 +1,173 @@
+from Maze import Maze
+from queue import Queue
+import numpy as np
+import subprocess
+import threading
+import atexit
+import shutil
+import pygame
+import os
+
+class Recorder():
+    """
+    Records frames of autonomous play without a window and without slowing down training much.
+    The agent hands a snapshot of the state values and the agent position to the recorder after every step.
+    A background thread draws the snapshots on an offscreen Maze and encodes them, either into a directory
+    of numbered PNG images, or into a video file through an ffmpeg pipe.
+    """
+
+    frame_skip = 1 # Record every n-th step of the recorded runs
+    episodes = None # Runs to record, all runs if not set
+    fps = 30 # Frame rate of a video file
+    cell_size = 150
+    max_queue = 256 # Snapshots waiting to be encoded, training waits when the encoder falls this far behind
+
+    # File extensions that are encoded to a video with ffmpeg, anything else is a directory of PNG images
+    video_extensions = (".mp4", ".avi", ".mkv", ".mov", ".webm", ".gif")
+
+    def __init__(self, path, frame_skip=1, episodes=None, fps=30, cell_size=150, max_queue=256):
+        """
+        :param path: directory to write frame_000000.png, frame_000001.png, ... into, or a video file like run.mp4
+        :param frame_skip: record every n-th step of the recorded runs
+        :param episodes: runs to record: a collection of run numbers, a function that takes the run number
+                         and returns whether to record it, or None to record all runs
+        :param fps: frame rate of a video file
+        :param cell_size: size of a cell in pixels
+        :param max_queue: number of snapshots that can wait to be encoded
+        """
+        self.path = path
+        self.frame_skip = frame_skip
+        self.episodes = episodes
+        self.fps = fps
+        self.cell_size = cell_size
+        self.max_queue = max_queue
+
+        self.video = os.path.splitext(path)[1].lower() in self.video_extensions
+        if self.video and shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg was not found, record to a directory of PNG images instead")
+
+        self.maze = None # Offscreen maze, only used by the encoder thread
+        self.encoder = None # ffmpeg process of a video file
+        self.steps = 0 # Steps seen of the recorded runs, to skip frames
+        self.frames = 0 # Frames encoded so far
+        self.error = None # Exception raised by the encoder thread
+        self.queue = Queue(max_queue)
+        self.thread = None
+
+    def should_record(self, run):
+        """
+        :return: whether the given run is recorded
+        """
+        if self.episodes is None:
+            return True
+        if callable(self.episodes):
+            return self.episodes(run)
+        return run in self.episodes
+
+    def record(self, env, run, exploration_rate=0, converged=False):
+        """
+        Take a snapshot of the environment after a step. It is only copied when the run is recorded
+        and the step isn't skipped, and it is drawn and encoded on the background thread.
+
+        :param env: the Environment the agent plays in
+        :param run: the current run
+        """
+        if self.error is not None:
+            raise RuntimeError("Recording failed") from self.error
+        if not self.should_record(run):
+            return
+        self.steps += 1
+        if (self.steps - 1) % self.frame_skip != 0:
+            return
+
+        if self.thread is None:
+            self.start(env)
+        snapshot = (np.array(env.values), env.agent_row, env.agent_col, env.points, run, exploration_rate, converged)
+        self.queue.put(snapshot)
+
+    def start(self, env):
+        """
+        Create the offscreen maze with the layout of the environment and start the encoder thread
+        """
+        self.maze = Maze(cell_size=self.cell_size, grid=env.grid.copy(), offscreen=True)
+        if self.video:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Video encoders need an even width and height
+            self.encoder = subprocess.Popen(
+                ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                 "-s", f"{self.maze.width}x{self.maze.height}", "-r", str(self.fps), "-i", "-",
+                 "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", self.path],
+                stdin=subprocess.PIPE)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+
+        self.thread = threading.Thread(target=self.encode, daemon=True)
+        self.thread.start()
+        # Finish the file when the program exits, e.g. when the maze shuts down after convergence
+        atexit.register(self.close)
+
+    def encode(self):
+        """
+        Draw and encode snapshots until the recorder is closed. Runs on the background thread.
+        """
+        while True:
+            snapshot = self.queue.get()
+            try:
+                if snapshot is None:
+                    return
+                if self.error is None:
+                    self.write_frame(snapshot)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def write_frame(self, snapshot):
+        """
+        Draw a snapshot on the offscreen maze and write it as the next frame
+        """
+        values, agent_row, agent_col, points, run, exploration_rate, converged = snapshot
+        maze = self.maze
+        np.copyto(maze.values, values)
+        maze.agent_row, maze.agent_col = agent_row, agent_col
+        maze.points = points
+        maze.generate_maze(run=run, exploration_rate=exploration_rate)
+        if converged:
+            maze.visualize_convergence()
+
+        if self.encoder is not None:
+            self.encoder.stdin.write(pygame.image.tobytes(maze.screen, "RGB"))
+        else:
+            pygame.image.save(maze.screen, os.path.join(self.path, f"frame_{self.frames:06d}.png"))
+        self.frames += 1
+
+    def flush(self):
+        """
+        Wait until all snapshots taken so far have been encoded
+        """
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """
+        Encode the remaining snapshots, stop the encoder thread and finish the video file.
+        """
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        atexit.unregister(self.close)
+
+        if self.encoder is not None:
+            self.encoder.stdin.close()
+            self.encoder.wait()
+            self.encoder = None
+        if self.error is not None:
+            raise RuntimeError("Recording failed") from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
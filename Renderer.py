@@ -0,0 +1,81 @@
+from Maze import Maze
+import numpy as np
+import pygame
+
+class Renderer():
+    """
+    Shows the training progress of an agent that plays on another thread. At a fixed frame rate it copies
+    a snapshot of the state values and the agent position into its own Maze, and draws it.
+    The renderer also handles the pygame events, so the training thread never touches pygame.
+    """
+
+    linger = 3 # Seconds to keep showing the last frame after training has finished
+
+    def __init__(self, agent, fps=30):
+        """
+        :param agent: the Agent that is training
+        :param fps: frames per second to draw
+        """
+        self.agent = agent
+        self.fps = fps
+        self.maze = None
+        self.clock = pygame.time.Clock()
+
+    def snapshot(self, env):
+        """
+        Copy the latest state of the training environment into the maze that is drawn.
+        The values may be updated while they are copied, which at worst shows a value one step early.
+        """
+        if self.maze is None:
+            self.maze = Maze(cell_size=self.agent.cell_size, grid=env.grid.copy())
+
+        np.copyto(self.maze.values, env.values)
+        self.maze.agent_row, self.maze.agent_col = env.agent_row, env.agent_col
+        self.maze.points = env.points
+
+    def draw(self):
+        """
+        Draw a snapshot of the training environment
+        """
+        env = self.agent.maze
+        if env is None:
+            return
+
+        self.snapshot(env)
+        self.maze.generate_maze(run=self.agent.run, exploration_rate=self.agent.exploration_rate)
+        if self.agent.converged:
+            self.maze.visualize_convergence()
+
+    def handle_events(self):
+        """
+        :return: False if the window has been closed
+        """
+        if self.maze is None:
+            return True
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        return True
+
+    def run(self, training):
+        """
+        Draw frames until the training thread has finished or the window is closed.
+
+        :param training: the training thread
+        """
+        while training.is_alive():
+            if not self.handle_events():
+                print(f"Terminating game. Total runs: {self.agent.run}!")
+                self.agent.stopped = True
+                pygame.quit()
+                return
+            self.draw()
+            self.clock.tick(self.fps)
+
+        # Show the final state, after the optimal route has been played
+        self.draw()
+        for _ in range(int(self.linger * self.fps)):
+            if not self.handle_events():
+                break
+            self.clock.tick(self.fps)
+        pygame.quit()
@@ -0,0 +1,155 @@
+from Solver import Solver
+from Grid import WALL
+import numpy as np
+import math
+
+class Routes():
+    """
+    Queries on the optimal routes of a maze with converged state values. The greedy policy is extracted once,
+    and turned into an array with the next state of every state. Pointer jumping over that array,
+    repeatedly following the next state of the next state, gives the return, the length and the finish of
+    the route from every state in about log2(number of cells) vectorized passes.
+    Every query accepts arrays of rows and columns, so thousands of start positions are answered in one call.
+
+    The results are cached until the values of the grid change. Whoever writes the values tells the routes so,
+    either by bumping the version counter the routes were given, or by calling invalidate.
+    Moves follow Environment.step: a move into a wall keeps the agent on the same state, and the agent gets
+    the reward of every state it lands on, including the terminal state.
+    Routes that never reach a terminal state, e.g. from unreachable parts of the maze, have a return of NaN
+    and a length of -1.
+    """
+
+    # Moves in the same order as Policy.select_action: left, right, up, down
+    row_moves = np.array([0, 0, -1, 1])
+    col_moves = np.array([-1, 1, 0, 0])
+
+    def __init__(self, grid, solver=None, version=None):
+        """
+        :param grid: the Grid with the converged state values
+        :param solver: the Solver that extracts the greedy policy
+        :param version: optional function that returns a counter which changes whenever the values are written,
+                        like Agent.values_version. Without it, call invalidate after changing the values.
+        """
+        self.grid = grid
+        self.solver = solver if solver is not None else Solver()
+        self.version = version
+        self.build()
+
+    def build(self):
+        """
+        Extract the greedy policy from the current values, and calculate the return, length and finish
+        of the route from every state.
+        """
+        grid = self.grid
+        self.built_version = self.version() if self.version is not None else None
+        self.stale = False
+        self.policy = self.solver.greedy_policy(grid, grid.values)
+
+        # Next state of every state, walls and terminal states point to themselves
+        num_cells = grid.num_rows * grid.num_cols
+        states = np.arange(num_cells)
+        actions = self.policy.ravel()
+        moving = actions >= 0
+        next_states = states.copy()
+        targets = states[moving] + (self.row_moves * grid.num_cols + self.col_moves)[actions[moving]]
+        next_states[moving] = np.where(grid.ids.ravel()[targets] == WALL, states[moving], targets)
+        self.next_states = next_states
+
+        # Pointer jumping: after pass k, jumps holds the state 2^k steps ahead,
+        # and gains and lengths the reward and number of steps on the way there
+        jumps = next_states
+        gains = np.where(moving, grid.rewards.ravel()[next_states], 0).astype(np.float64)
+        lengths = moving.astype(np.int64)
+        for _ in range(max(1, math.ceil(math.log2(num_cells)))):
+            gains = gains + gains[jumps]
+            lengths = lengths + lengths[jumps]
+            jumps = jumps[jumps]
+
+        # Routes that are still moving after more steps than there are cells are caught in a loop
+        finished = ~moving[jumps]
+        self.finishes = np.where(finished, jumps, -1)
+        self.returns = np.where(finished, gains, np.nan)
+        self.lengths = np.where(finished, lengths, -1)
+
+    def invalidate(self):
+        """
+        Mark the cached routes as out of date, so the next query rebuilds them from the current values.
+        """
+        self.stale = True
+
+    def refresh(self):
+        """
+        Rebuild the cached routes if the values of the grid changed since they were built.
+        """
+        if self.stale or (self.version is not None and self.version() != self.built_version):
+            self.build()
+
+    def states(self, rows, cols):
+        """
+        :return: the flat state indices (row * number of columns + col) of the given positions
+        """
+        return np.ravel_multi_index((rows, cols), (self.grid.num_rows, self.grid.num_cols))
+
+    def next_action(self, rows, cols):
+        """
+        :return: the best action from every given position (0 = left, 1 = right, 2 = up, 3 = down),
+                 -1 for walls and terminal states
+        """
+        self.refresh()
+        return self.policy[rows, cols]
+
+    def route_return(self, rows, cols):
+        """
+        :return: the total reward of the optimal route from every given position to a terminal state
+        """
+        self.refresh()
+        return self.returns[self.states(rows, cols)]
+
+    def route_length(self, rows, cols):
+        """
+        :return: the number of steps of the optimal route from every given position to a terminal state
+        """
+        self.refresh()
+        return self.lengths[self.states(rows, cols)]
+
+    def finish(self, rows, cols):
+        """
+        :return: a tuple of the rows and the columns of the terminal state where the route from every given
+                 position ends, -1 for routes that never finish
+        """
+        self.refresh()
+        finishes = self.finishes[self.states(rows, cols)]
+        finish_rows, finish_cols = np.divmod(finishes, self.grid.num_cols)
+        return np.where(finishes >= 0, finish_rows, -1), np.where(finishes >= 0, finish_cols, -1)
+
+    def routes(self, rows, cols, max_length=None):
+        """
+        Follow the optimal routes from all given positions at once.
+
+        :param max_length: maximum number of steps, the length of the longest finished route by default
+        :return: a tuple of 2D arrays with the rows and the columns of every route, one route per row,
+                 starting with the start position and padded with -1 after the terminal state
+        """
+        self.refresh()
+        states = np.atleast_1d(self.states(rows, cols))
+        lengths = self.lengths[states]
+        if max_length is None:
+            max_length = int(lengths.max(initial=0))
+
+        path = np.empty((len(states), max_length + 1), dtype=np.int64)
+        path[:, 0] = states
+        for step in range(1, max_length + 1):
+            path[:, step] = self.next_states[path[:, step - 1]]
+
+        # Pad the routes after their terminal state
+        steps = np.arange(max_length + 1)
+        path[(lengths[:, np.newaxis] >= 0) & (steps > lengths[:, np.newaxis])] = -1
+        path_rows, path_cols = np.divmod(path, self.grid.num_cols)
+        return np.where(path >= 0, path_rows, -1), np.where(path >= 0, path_cols, -1)
+
+    def route(self, row, col):
+        """
+        :return: list of the (row, col) positions of the optimal route from a single position
+        """
+        path_rows, path_cols = self.routes([row], [col])
+        return [(int(r), int(c)) for r, c in zip(path_rows[0], path_cols[0]) if r >= 0]
@@ -0,0 +1,258 @@
+import numpy as np
+import heapq
+import warnings
+from Grid import WALL
+from TransitionModel import TransitionModel
+
+class Solver():
+    """
+    Planning solvers that compute the state values of a maze directly from its grid,
+    without letting an agent play episodes.
+    """
+
+    max_sweeps = 100000 # Safety limit, for states that can never reach a terminal state
+    max_backups = 10**9 # Safety limit for prioritized sweeping
+    sweeps = 0 # Number of sweeps used by the last solve
+    backups = 0 # Number of single state backups used by the last solve
+
+    # Moves in the same order as Policy.select_action: left, right, up, down
+    moves = [(0,-1), (0,1), (-1,0), (1,0)]
+
+    def neighbour_values(self, values, rewards, out=None):
+        """
+        Calculate reward + value of the next state for every interior state and each of the four actions,
+        in the same order as Policy.select_action: 0 = left, 1 = right, 2 = up, 3 = down.
+        Moves into walls are kept, just like in Policy.select_action, where they get the wall reward.
+
+        :param values: 2D array of state values
+        :param rewards: 2D array of rewards
+        :param out: optional array of shape (4, num_rows-2, num_cols-2) to write the result into
+        :return: array of shape (4, num_rows-2, num_cols-2)
+        """
+        num_rows, num_cols = values.shape
+        if out is None:
+            out = np.empty((4, num_rows-2, num_cols-2))
+
+        np.add(rewards[1:-1, :-2], values[1:-1, :-2], out=out[0]) # Left
+        np.add(rewards[1:-1, 2:], values[1:-1, 2:], out=out[1]) # Right
+        np.add(rewards[:-2, 1:-1], values[:-2, 1:-1], out=out[2]) # Up
+        np.add(rewards[2:, 1:-1], values[2:, 1:-1], out=out[3]) # Down
+        return out
+
+    def bellman_errors(self, values, rewards):
+        """
+        Calculate how much the value of every state would change with one more backup, in a single vectorized sweep.
+
+        :param values: 2D array of state values
+        :param rewards: 2D array of rewards
+        :return: 2D array with the absolute Bellman error of every state, 0 on the outer edges
+        """
+        errors = np.zeros(values.shape)
+        errors[1:-1, 1:-1] = np.abs(np.max(self.neighbour_values(values, rewards), axis=0) - values[1:-1, 1:-1])
+        return errors
+
+    def greedy_policy(self, grid, values):
+        """
+        Extract the greedy policy from a value grid. Ties are broken towards the lowest action index.
+
+        :param grid: the Grid of the maze
+        :param values: 2D array of state values
+        :return: 2D int8 array with the best action of each state, -1 for walls and terminal states
+        """
+        policy = np.full((grid.num_rows, grid.num_cols), -1, dtype=np.int8)
+        best_actions = np.argmax(self.neighbour_values(values, grid.rewards), axis=0)
+
+        interior = policy[1:-1, 1:-1]
+        open_states = grid.open_mask()[1:-1, 1:-1]
+        interior[open_states] = best_actions[open_states]
+        return policy
+
+    def value_iteration(self, grid, epsilon=0.01):
+        """
+        Run synchronous Bellman backups over the whole grid at once, until the biggest value change
+        of a sweep is below epsilon. Walls and terminal states keep their value.
+
+        :param grid: the Grid of the maze
+        :param epsilon: convergence threshold on the maximum value change
+        :return: a tuple of the converged 2D value array and the greedy policy
+        """
+        values = grid.values.astype(np.float64, copy=True)
+        rewards = grid.rewards
+        open_states = grid.open_mask()[1:-1, 1:-1]
+
+        interior = values[1:-1, 1:-1]
+        next_values = np.empty((4,) + interior.shape)
+        best_values = np.empty(interior.shape)
+
+        self.sweeps = 0
+        while self.sweeps < self.max_sweeps:
+            self.sweeps += 1
+
+            self.neighbour_values(values, rewards, out=next_values)
+            np.max(next_values, axis=0, out=best_values)
+            best_values[~open_states] = interior[~open_states]
+
+            delta = np.max(np.abs(best_values - interior), initial=0)
+            interior[...] = best_values
+            if delta < epsilon:
+                break
+
+        self.backups = self.sweeps * int(np.count_nonzero(open_states))
+        return values, self.greedy_policy(grid, values)
+
+    def backup(self, values, rewards, row, col):
+        """
+        :return: the best reward + value of the next state, over the four moves from (row, col)
+        """
+        return max(rewards[row+dx, col+dy] + values[row+dx, col+dy] for dx, dy in self.moves)
+
+    def prioritized_sweeping(self, grid, epsilon=0.01, value_changes=None):
+        """
+        Update states in order of their Bellman error, instead of sweeping the whole grid.
+        States are kept in a heap keyed by their Bellman error. After a state is backed up,
+        its neighbours (the states that can move into it) are pushed again with their new error.
+        Only states which the value changes tracker marks as unoptimal (non-zero) are queued at the start,
+        the values of the other states are kept as they are.
+
+        :param grid: the Grid of the maze
+        :param epsilon: convergence threshold, states with a smaller Bellman error are not backed up
+        :param value_changes: value changes tracker of the agent, updated with the change of every backup
+        :return: a tuple of the converged 2D value array and the greedy policy
+        """
+        values = grid.values.astype(np.float64, copy=True)
+        rewards = grid.rewards
+        open_states = grid.open_mask()
+
+        queued = open_states.copy()
+        if value_changes is not None:
+            queued &= value_changes.changes != 0
+
+        # Unoptimal states start from a lower bound of their value. Values then only rise as the rewards
+        # of the terminal states spread outwards, so the largest errors are popped in order of distance
+        # and most states are backed up only once.
+        if queued.any():
+            values[queued] = -np.abs(rewards[open_states]).max() * np.count_nonzero(open_states) - 1
+
+        # Bellman error of all states at once
+        errors = self.bellman_errors(values, rewards)
+
+        queued &= errors >= epsilon
+        heap = [(-errors[row, col], row, col) for row, col in zip(*np.nonzero(queued))]
+        heapq.heapify(heap)
+
+        self.backups = 0
+        while heap and self.backups < self.max_backups:
+            _, row, col = heapq.heappop(heap)
+
+            # The state may have been pushed multiple times, skip it if it is already up to date
+            new_value = self.backup(values, rewards, row, col)
+            change = abs(new_value - values[row, col])
+            if change < epsilon:
+                continue
+
+            values[row, col] = new_value
+            self.backups += 1
+            if value_changes is not None:
+                value_changes.update(row, col, change)
+
+            # Push the predecessors of the state with their new Bellman error
+            for dx, dy in self.moves:
+                x, y = row + dx, col + dy
+                if not open_states[x, y]:
+                    continue
+                error = abs(self.backup(values, rewards, x, y) - values[x, y])
+                if error >= epsilon:
+                    heapq.heappush(heap, (-error, x, y))
+
+        # Record the remaining Bellman error of all states, which are now below epsilon
+        if value_changes is not None:
+            value_changes.update_all(self.bellman_errors(values, rewards), open_states)
+
+        return values, self.greedy_policy(grid, values)
+
+    def shortest_path(self, grid):
+        """
+        Solve a deterministic maze (probability = 1) exactly with a multi-source Dijkstra search.
+        The value of a state is then the best return of a path to an exit, where entering a cell gives its reward.
+        Exits are the terminal states, and the walls next to open states: just like in value_iteration and
+        Policy.select_action, moving into a wall gives the wall reward and ends the path, which is the best
+        a state can do when every path to a terminal state costs more.
+        The search walks backwards from the exits, in order of decreasing return, and settles every state once,
+        so the values are the same fixed point value_iteration converges to.
+
+        :param grid: the Grid of the maze, the rewards of the non-terminal states must not be positive
+        :return: a tuple of the 2D value array and the greedy policy
+        """
+        open_states = grid.open_mask()
+        if (grid.rewards[open_states] > 0).any():
+            raise ValueError("Shortest path search needs rewards of 0 or lower on non-terminal states")
+
+        values = grid.values.astype(np.float64, copy=True)
+        flat_values = values.ravel()
+        rewards = grid.rewards.ravel().tolist()
+        is_open = open_states.ravel().tolist()
+        settled = bytearray(len(is_open))
+
+        # Moves as steps in the flat grid, the outer walls keep them inside the grid
+        num_cols = grid.num_cols
+        moves = [-1, 1, -num_cols, num_cols]
+
+        # Exits: terminal states, and walls that an open state can move into
+        padded = np.pad(open_states, 1)
+        next_to_open = padded[1:-1, :-2] | padded[1:-1, 2:] | padded[:-2, 1:-1] | padded[2:, 1:-1]
+        exits = np.flatnonzero(grid.terminals | ((grid.ids == WALL) & next_to_open))
+
+        # Heap of the return of entering a cell, reward + value, with the best return first
+        entry_returns = grid.rewards.ravel()[exits] + values.ravel()[exits]
+        heap = list(zip((-entry_returns).tolist(), exits.tolist()))
+        heapq.heapify(heap)
+
+        self.backups = 0
+        while heap:
+            entry_return, cell = heapq.heappop(heap)
+            entry_return = -entry_return
+
+            # Every unsettled neighbour gets its best value from the first cell it can move into
+            for move in moves:
+                neighbour = cell + move
+                if not 0 <= neighbour < len(is_open) or not is_open[neighbour] or settled[neighbour]:
+                    continue
+                settled[neighbour] = 1
+                flat_values[neighbour] = entry_return
+                self.backups += 1
+                heapq.heappush(heap, (-(rewards[neighbour] + entry_return), neighbour))
+
+        return values, self.greedy_policy(grid, values)
+
+    def stochastic_value_iteration(self, grid, probability=1.0, epsilon=0.01):
+        """
+        Run synchronous expected-value Bellman backups for a stochastic maze, where the agent only takes
+        the chosen action with the given probability (see TransitionModel). Every sweep is one sparse
+        matrix-vector product with the transition model, which is built once.
+
+        :param grid: the Grid of the maze
+        :param probability: probability that the agent takes the chosen action
+        :param epsilon: convergence threshold on the maximum value change
+        :return: a tuple of the converged 2D value array and the greedy policy of the expected values
+        """
+        model = TransitionModel(grid, probability)
+        values = grid.values.astype(np.float64, copy=True)
+        flat_values = values.ravel()
+
+        self.sweeps = 0
+        while self.sweeps < self.max_sweeps:
+            self.sweeps += 1
+
+            best_values = model.q_values(values, grid.rewards).max(axis=1)
+            delta = np.max(np.abs(best_values - flat_values[model.states]), initial=0)
+            flat_values[model.states] = best_values
+            if delta < epsilon:
+                break
+        else:
+            warnings.warn(f"Stochastic value iteration stopped after {self.max_sweeps} sweeps without converging",
+                          RuntimeWarning)
+        self.backups = self.sweeps * len(model.states)
+
+        policy = np.full(values.shape, -1, dtype=np.int8)
+        policy.ravel()[model.states] = np.argmax(model.q_values(values, grid.rewards), axis=1)
+        return values, policy
@@ -0,0 +1,84 @@
+from Agent import Agent
+from Grid import Grid
+from itertools import product
+from multiprocessing import Pool
+from time import perf_counter
+import argparse
+import csv
+
+# Columns of the results table
+fields = ["probability", "exploration_rate_decay_factor", "size", "seed",
+          "converged", "runs", "steps", "points", "wall_time"]
+
+
+def run_configuration(configuration):
+    """
+    Play one headless autonomous game until convergence.
+
+    :param configuration: a tuple of (probability, exploration_rate_decay_factor, size, seed, max_runs, grid_path)
+    :return: a dict with one row of the results table
+    """
+    probability, decay_factor, size, seed, max_runs, grid_path = configuration
+
+    # Workers share the memory-mapped layout of a grid file, instead of each loading it.
+    # The values are copy-on-write, so they are private to the worker and are learned in place,
+    # without copying them into memory first.
+    grid = Grid.open_memmap(grid_path) if grid_path is not None else None
+    agent = Agent(num_rows=size, num_cols=size, render=False, grid=grid, copy_grid=False, seed=seed)
+    start = perf_counter()
+    runs = agent.autonomous_play(random_agent=False, probability=probability,
+                                 exploration_rate_decay_factor=decay_factor, max_runs=max_runs)
+    wall_time = perf_counter() - start
+
+    return {"probability": probability, "exploration_rate_decay_factor": decay_factor,
+            "size": f"{agent.num_rows}x{agent.num_cols}", "seed": seed,
+            "converged": agent.converged, "runs": runs, "steps": agent.steps, "points": agent.maze.points,
+            "wall_time": wall_time}
+
+
+def sweep(probabilities, decay_factors, sizes, seeds, max_runs=None, processes=None, grid_path=None):
+    """
+    Run every combination of the given hyperparameters headless across a process pool.
+
+    :param probabilities: values for the probability of selecting the best action
+    :param decay_factors: values for the exploration_rate_decay_factor
+    :param sizes: maze sizes, the mazes have as many rows as columns
+    :param seeds: random seeds, one run per seed for every configuration
+    :param max_runs: optional limit on the number of runs of every game
+    :param processes: number of worker processes (default: all cores)
+    :param grid_path: optional grid file written by Grid.save_memmap, which replaces the default maze of every size
+    :return: list of dicts, one row of the results table per configuration
+    """
+    if grid_path is not None:
+        sizes = [None]
+    configurations = [configuration + (max_runs, grid_path)
+                      for configuration in product(probabilities, decay_factors, sizes, seeds)]
+    with Pool(processes) as pool:
+        return pool.map(run_configuration, configurations, chunksize=1)
+
+
+def write_results(results, path):
+    """
+    Write the results table to a CSV file
+    """
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep of headless autonomous play")
+    parser.add_argument("--probability", type=float, nargs="+", default=[0.8])
+    parser.add_argument("--decay-factor", type=float, nargs="+", default=[0, 1, 2, 3, 4, 5])
+    parser.add_argument("--size", type=int, nargs="+", default=[6])
+    parser.add_argument("--seed", type=int, nargs="+", default=list(range(10)))
+    parser.add_argument("--max-runs", type=int, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--grid", default=None, help="grid file written by Grid.save_memmap")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    results = sweep(args.probability, args.decay_factor, args.size, args.seed, args.max_runs, args.processes, args.grid)
+    write_results(results, args.output)
+    print(f"Wrote {len(results)} results to {args.output}")
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+class TextCache():
+    """
+    Bounded least-recently-used cache of rendered text surfaces, keyed by the string, the font and the colour.
+    Rendering text is expensive, and most texts on the maze don't change between frames.
+    """
+
+    def __init__(self, max_size=1024):
+        """
+        :param max_size: maximum number of rendered texts to keep
+        """
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        """
+        Render a text with antialiasing, or take it from the cache if it has been rendered before.
+
+        :param font: the pygame font to render with
+        :param text: the string to render
+        :param color: the colour of the text
+        :return: the rendered text surface
+        """
+        key = (text, id(font), color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            # Drop the least recently used text
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
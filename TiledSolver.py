@@ -0,0 +1,154 @@
+from Solver import Solver
+from multiprocessing import shared_memory
+import multiprocessing
+import numpy as np
+import math
+import os
+
+class TiledSolver():
+    """
+    Value iteration over multiple cores. The values, rewards and open states of the grid are placed in
+    shared memory, and every worker process does the Bellman backups of its own rectangular tile of the grid,
+    with the same four-neighbour rule as Solver.value_iteration.
+
+    The values are double-buffered: every sweep reads one buffer and writes the other, so the border cells
+    of the neighbouring tiles (the halo) are read straight from shared memory, without copying them.
+    After every sweep the workers meet at a barrier, and each of them takes the maximum of the value changes
+    of all tiles, so they all stop on the same sweep once it is below epsilon.
+    """
+
+    max_sweeps = 100000 # Safety limit, for states that can never reach a terminal state
+    sweeps = 0 # Number of sweeps used by the last solve
+    backups = 0 # Number of single state backups used by the last solve
+
+    def __init__(self, num_workers=None):
+        """
+        :param num_workers: number of worker processes (default: all cores)
+        """
+        self.num_workers = num_workers or os.cpu_count()
+
+    def tile_bounds(self, num_rows, num_cols):
+        """
+        Split the interior of the grid into one tile per worker, in a layout that is as square as possible.
+
+        :return: list of (first row, last row + 1, first col, last col + 1) of every tile
+        """
+        # Among the ways to split the workers into tile rows and columns, pick the one with the squarest tiles
+        interior_rows, interior_cols = num_rows - 2, num_cols - 2
+        def aspect(tile_rows):
+            tile_cols = self.num_workers // tile_rows
+            return abs(math.log((interior_rows / tile_rows) / (interior_cols / tile_cols)))
+
+        tile_rows = min((rows for rows in range(1, self.num_workers + 1) if self.num_workers % rows == 0), key=aspect)
+        tile_cols = self.num_workers // tile_rows
+
+        row_edges = np.linspace(1, num_rows - 1, min(tile_rows, interior_rows) + 1).astype(int)
+        col_edges = np.linspace(1, num_cols - 1, min(tile_cols, interior_cols) + 1).astype(int)
+        return [(int(top), int(bottom), int(left), int(right))
+                for top, bottom in zip(row_edges[:-1], row_edges[1:])
+                for left, right in zip(col_edges[:-1], col_edges[1:])]
+
+    def value_iteration(self, grid, epsilon=0.01):
+        """
+        Run synchronous Bellman backups over the whole grid, split over the worker processes, until the biggest
+        value change of a sweep is below epsilon. Walls and terminal states keep their value.
+
+        :param grid: the Grid of the maze
+        :param epsilon: convergence threshold on the maximum value change
+        :return: a tuple of the converged 2D value array and the greedy policy
+        """
+        shape = (grid.num_rows, grid.num_cols)
+        tiles = self.tile_bounds(*shape)
+        arrays = {"values": ((2,) + shape, np.float64), "rewards": (shape, np.int32), "open_states": (shape, bool),
+                  "deltas": ((2, len(tiles)), np.float64), "sweeps": ((1,), np.int64)}
+
+        blocks = {}
+        try:
+            for name, (array_shape, dtype) in arrays.items():
+                size = max(1, int(np.prod(array_shape)) * np.dtype(dtype).itemsize)
+                blocks[name] = shared_memory.SharedMemory(create=True, size=size)
+            shared = {name: np.ndarray(arrays[name][0], arrays[name][1], buffer=block.buf)
+                      for name, block in blocks.items()}
+
+            shared["values"][:] = grid.values
+            shared["rewards"][...] = grid.rewards
+            shared["open_states"][...] = grid.open_mask()
+
+            specs = {name: (blocks[name].name, array_shape, dtype) for name, (array_shape, dtype) in arrays.items()}
+            barrier = multiprocessing.Barrier(len(tiles))
+            workers = [multiprocessing.Process(target=sweep_tile,
+                                               args=(specs, index, tile, barrier, epsilon, self.max_sweeps))
+                       for index, tile in enumerate(tiles)]
+            for worker in workers:
+                worker.start()
+
+            # A failed worker would leave the others waiting at the barrier forever, so break it
+            while any(worker.is_alive() for worker in workers):
+                workers[0].join(0.1)
+                if any(worker.exitcode not in (None, 0) for worker in workers):
+                    barrier.abort()
+            for worker in workers:
+                worker.join()
+            if any(worker.exitcode != 0 for worker in workers):
+                raise RuntimeError("A worker of the tiled solver failed")
+
+            # Sweep n read buffer (n - 1) % 2 and wrote buffer n % 2
+            self.sweeps = int(shared["sweeps"][0])
+            values = shared["values"][self.sweeps % 2].copy()
+            self.backups = self.sweeps * int(np.count_nonzero(shared["open_states"]))
+            del shared
+        finally:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+
+        return values, Solver().greedy_policy(grid, values)
+
+
+def sweep_tile(specs, index, tile, barrier, epsilon, max_sweeps):
+    """
+    Worker process of the TiledSolver: back up the states of one tile every sweep, until all tiles converged.
+
+    :param specs: dict with the shared memory name, shape and dtype of each shared array
+    :param index: index of the tile, which is also its slot in the shared deltas
+    :param tile: (first row, last row + 1, first col, last col + 1) of the tile
+    """
+    blocks = {name: shared_memory.SharedMemory(name=block_name) for name, (block_name, _, _) in specs.items()}
+    try:
+        shared = {name: np.ndarray(shape, dtype, buffer=blocks[name].buf) for name, (_, shape, dtype) in specs.items()}
+        top, bottom, left, right = tile
+
+        # The tile plus a halo of one cell on every side, which is read but never written
+        halo = (slice(top - 1, bottom + 1), slice(left - 1, right + 1))
+        cells = (slice(top, bottom), slice(left, right))
+        rewards = np.array(shared["rewards"][halo])
+        open_states = np.array(shared["open_states"][cells])
+
+        solver = Solver()
+        next_values = np.empty((4, bottom - top, right - left))
+        best_values = np.empty((bottom - top, right - left))
+
+        sweeps = 0
+        while sweeps < max_sweeps:
+            old_values = shared["values"][sweeps % 2]
+            new_values = shared["values"][(sweeps + 1) % 2]
+            sweeps += 1
+
+            solver.neighbour_values(old_values[halo], rewards, out=next_values)
+            np.max(next_values, axis=0, out=best_values)
+            best_values[~open_states] = old_values[cells][~open_states]
+
+            shared["deltas"][sweeps % 2, index] = np.max(np.abs(best_values - old_values[cells]), initial=0)
+            new_values[cells] = best_values
+
+            # Wait for all tiles, then every worker makes the same decision from the deltas of this sweep
+            barrier.wait()
+            if shared["deltas"][sweeps % 2].max() < epsilon:
+                break
+
+        if index == 0:
+            shared["sweeps"][0] = sweeps
+        del shared, old_values, new_values
+    finally:
+        for block in blocks.values():
+            block.close()
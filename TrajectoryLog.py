@@ -0,0 +1,184 @@
+import numpy as np
+import atexit
+import struct
+import os
+
+# Header of trajectory log files: magic, version, record size, rows and columns of the maze
+header_format = "<8sIIqq"
+header_size = 64
+magic = b"MAZETRAJ"
+version = 1
+
+# One fixed-width record per step
+record_dtype = np.dtype([
+    ("run", "<u4"),
+    ("step", "<u8"), # Step counter of the agent, over all runs
+    ("row", "<u4"), # State the step started from
+    ("col", "<u4"),
+    ("action", "i1"), # 0 = left, 1 = right, 2 = up, 3 = down
+    ("next_row", "<u4"), # State the agent landed on
+    ("next_col", "<u4"),
+    ("reward", "<i4"),
+    ("value", "<f8"), # Value of the start state after the update of this step
+    ("value_change", "<f8"),
+    ("done", "?"), # Whether the agent landed on a terminal state
+])
+
+
+class TrajectoryLog():
+    """
+    Append-only binary log of every step the agent takes. Steps are collected in a preallocated buffer
+    of fixed-width records, which is written to the file in bulk once it is full, so logging costs one
+    record assignment per step. The file starts with a small header, followed by the raw records.
+
+    The static methods read a log back lazily in chunks, so files of millions of steps can be
+    analysed, replayed or used for offline learning without loading them into memory.
+    """
+
+    buffer_size = 65536 # Number of records collected before they are written
+
+    def __init__(self, path, num_rows, num_cols, buffer_size=65536):
+        """
+        Open a log for writing. Records are appended if the file already exists.
+
+        :param path: the log file
+        :param num_rows: number of rows of the maze, stored in the header
+        :param num_cols: number of columns of the maze, stored in the header
+        :param buffer_size: number of records collected before they are written
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = np.zeros(buffer_size, dtype=record_dtype)
+        self.position = 0
+        self.records = 0 # Records logged since the log was opened
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            file_rows, file_cols = self.read_header(path)
+            if (file_rows, file_cols) != (num_rows, num_cols):
+                raise ValueError(f"{path} is a log of a {file_rows}x{file_cols} maze")
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            header = struct.pack(header_format, magic, version, record_dtype.itemsize, num_rows, num_cols)
+            self.file.write(header.ljust(header_size, b"\0"))
+
+        # Write the last records when the program exits, e.g. when the maze shuts down after convergence
+        atexit.register(self.close)
+
+    def log(self, run, step, row, col, action, next_row, next_col, reward, value, value_change, done):
+        """
+        Add the record of one step to the buffer, and write the buffer to the file when it is full.
+        """
+        self.buffer[self.position] = (run, step, row, col, action, next_row, next_col, reward, value,
+                                      value_change, done)
+        self.position += 1
+        self.records += 1
+        if self.position == self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records to the file
+        """
+        if self.position:
+            self.buffer[:self.position].tofile(self.file)
+            self.position = 0
+        self.file.flush()
+
+    def close(self):
+        """
+        Write the remaining records and close the file
+        """
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def read_header(path):
+        """
+        :return: a tuple of the number of rows and columns of the maze of a log file
+        """
+        with open(path, "rb") as file:
+            header = file.read(header_size)
+        if len(header) < header_size:
+            raise ValueError(f"{path} is not a trajectory log")
+
+        file_magic, file_version, record_size, num_rows, num_cols = struct.unpack_from(header_format, header)
+        if file_magic != magic or file_version != version or record_size != record_dtype.itemsize:
+            raise ValueError(f"{path} is not a trajectory log")
+        return num_rows, num_cols
+
+    @staticmethod
+    def chunks(path, chunk_size=65536):
+        """
+        Read a log file lazily, one chunk of records at a time.
+
+        :param chunk_size: maximum number of records per chunk
+        :return: a generator of structured arrays with the fields of record_dtype
+        """
+        TrajectoryLog.read_header(path)
+        with open(path, "rb") as file:
+            file.seek(header_size)
+            while True:
+                chunk = np.fromfile(file, dtype=record_dtype, count=chunk_size)
+                if len(chunk) == 0:
+                    return
+                yield chunk
+
+    @staticmethod
+    def steps(path, chunk_size=65536):
+        """
+        :return: a generator of the single records of a log file, in the order they were logged
+        """
+        for chunk in TrajectoryLog.chunks(path, chunk_size):
+            yield from chunk
+
+    @staticmethod
+    def episodes(path, chunk_size=65536):
+        """
+        :return: a generator of tuples of the run number and a structured array with the records of that run
+        """
+        parts, run = [], None
+        for chunk in TrajectoryLog.chunks(path, chunk_size):
+            # Split the chunk where the run changes
+            edges = np.flatnonzero(np.diff(chunk["run"])) + 1
+            for part in np.split(chunk, edges):
+                if run is not None and part["run"][0] != run:
+                    yield run, np.concatenate(parts)
+                    parts = []
+                run = int(part["run"][0])
+                parts.append(part)
+        if parts:
+            yield run, np.concatenate(parts)
+
+    @staticmethod
+    def replay(path, env, runs=None, chunk_size=65536):
+        """
+        Replay a log step by step on an environment, e.g. a Maze to draw it. Before every step is yielded,
+        the agent is moved, the points are updated and the logged value is written into the values of the environment.
+        Values start at 0, so for the value-learning agent, the replayed values match the learned values exactly.
+
+        :param env: the Environment or Maze with the same layout as the logged maze
+        :param runs: optional collection of the runs to replay
+        :return: a generator of the record of every replayed step
+        """
+        run = None
+        env.values[...] = 0
+        for record in TrajectoryLog.steps(path, chunk_size):
+            env.values[record["row"], record["col"]] = record["value"]
+            if runs is not None and int(record["run"]) not in runs:
+                continue
+            if record["run"] != run:
+                run = record["run"]
+                env.reset()
+            env.agent_row, env.agent_col = int(record["next_row"]), int(record["next_col"])
+            env.points += int(record["reward"])
+            yield record
@@ -0,0 +1,61 @@
+import numpy as np
+
+class TransitionModel():
+    """
+    Sparse transition model of a stochastic maze, built once from the grid and the slip probability.
+    The agent takes the chosen action with the given probability, otherwise it slips into one of the three
+    other actions, each with an equal chance. The reward is the reward of the state the move leads to.
+    A move into a wall leads to the wall, which gives the wall reward plus the wall value, just like the
+    backups of Solver.value_iteration and Policy.select_action, so states that can't reach a terminal state
+    converge as well.
+
+    The model is stored in CSR form: one row per (open state, action) pair, with the probabilities of the
+    next states of the four actual moves, so an expected-value backup of every state is one sparse
+    matrix-vector product.
+    """
+
+    # Moves in the same order as Policy.select_action: left, right, up, down
+    row_moves = np.array([0, 0, -1, 1])
+    col_moves = np.array([-1, 1, 0, 0])
+
+    def __init__(self, grid, probability=1.0):
+        """
+        :param grid: the Grid of the maze
+        :param probability: probability that the agent takes the chosen action
+        """
+        self.num_rows, self.num_cols = grid.num_rows, grid.num_cols
+        self.probability = probability
+
+        # Only open states are backed up, walls and terminal states keep their value
+        self.states = np.flatnonzero(grid.open_mask())
+        num_states = len(self.states)
+
+        # Next cell of each actual move, the outer walls keep them inside the grid
+        next_states = self.states[:, np.newaxis] + (self.row_moves * self.num_cols + self.col_moves)
+
+        # Probability of each actual move (columns) given the chosen action (rows)
+        move_probabilities = np.full((4, 4), (1 - probability) / 3)
+        np.fill_diagonal(move_probabilities, probability)
+
+        # CSR arrays, with four entries per (state, action) row
+        self.indices = np.repeat(next_states[:, np.newaxis, :], 4, axis=1).reshape(-1).astype(np.int64)
+        self.data = np.tile(move_probabilities.reshape(-1), num_states)
+        self.indptr = np.arange(0, len(self.data) + 1, 4)
+        self.shape = (num_states * 4, self.num_rows * self.num_cols)
+
+    def dot(self, x):
+        """
+        Multiply the transition matrix with a vector over all cells of the grid.
+
+        :param x: flat array with one number per cell, e.g. reward + value
+        :return: array of shape (number of open states, 4) with the product for each (state, action) row
+        """
+        products = self.data * x[self.indices]
+        return np.add.reduceat(products, self.indptr[:-1]).reshape(-1, 4)
+
+    def q_values(self, values, rewards):
+        """
+        :return: array of shape (number of open states, 4) with the expected reward + value of the next state
+                 of each action
+        """
+        return self.dot((rewards + values).ravel())
@@ -0,0 +1,77 @@
+import numpy as np
+
+class ValueChangeTracker():
+    """
+    A 2D matrix, which is a copy of the maze, in which the last value change of each state is saved.
+    Next to the matrix it keeps running counts of the unoptimal states (non-zero value change) and of the states
+    whose value change is at or above epsilon, so the exploration rate and the convergence test are constant-time.
+    """
+
+    def __init__(self, relevant_states, epsilon):
+        """
+        :param relevant_states: boolean 2D array which is True for the states that will be updated.
+                                Terminal states and outer walls are False, they are seen as optimal states already.
+        :param epsilon: convergence threshold on the maximum value change
+        """
+        self.epsilon = epsilon
+        self.changes = relevant_states.astype(np.float64)
+        self.recount()
+
+    def recount(self):
+        """
+        Recount the unoptimal states and the states above epsilon from the whole matrix
+        """
+        self.unoptimal_states = int(np.count_nonzero(self.changes))
+        self.changes_above_epsilon = int(np.count_nonzero(self.changes >= self.epsilon))
+
+    def update(self, row, col, change):
+        """
+        Record the latest value change of a state, and update the running counts.
+        """
+        change = float(change)
+        old_change = float(self.changes[row, col])
+        self.unoptimal_states += (change != 0) - (old_change != 0)
+        self.changes_above_epsilon += (change >= self.epsilon) - (old_change >= self.epsilon)
+        self.changes[row, col] = change
+
+    def update_states(self, states, changes):
+        """
+        Record the latest value changes of a batch of states, and update the running counts.
+
+        :param states: array of unique flat state indices (row * number of columns + col)
+        :param changes: array with the value change of each state
+        """
+        flat_changes = self.changes.reshape(-1)
+        old_changes = flat_changes[states]
+        self.unoptimal_states += int(np.count_nonzero(changes)) - int(np.count_nonzero(old_changes))
+        self.changes_above_epsilon += (int(np.count_nonzero(changes >= self.epsilon))
+                                       - int(np.count_nonzero(old_changes >= self.epsilon)))
+        flat_changes[states] = changes
+
+    def update_all(self, changes, mask=None):
+        """
+        Record the value changes of many states at once.
+
+        :param changes: 2D array of value changes, with the same shape as the maze
+        :param mask: optional boolean 2D array selecting the states to update
+        """
+        if mask is None:
+            self.changes[...] = changes
+        else:
+            self.changes[mask] = changes[mask]
+        self.recount()
+
+    def converged(self):
+        """
+        :return: True if the biggest value change of all states is below epsilon
+        """
+        return self.changes_above_epsilon == 0
+
+    def max_change(self):
+        """
+        :return: the biggest value change of all states
+        """
+        return float(self.changes.max())
+
+    def __getitem__(self, row):
+        return self.changes[row]
@@ -0,0 +1,104 @@
+import numpy as np
+from Environment import Environment
+from Grid import WALL
+
+class VectorEnvironment:
+    """
+    Batch of independent headless mazes with the same layout, which are all stepped in one call.
+    Every maze has its own agent position, points and state values, stored as arrays with the maze index first.
+    Use it together with Policy.select_actions, which selects the actions of all agents at once.
+    """
+
+    num_envs = 0
+    num_rows = 0
+    num_cols = 0
+
+    # Moves in the same order as Policy.select_action: left, right, up, down
+    row_moves = np.array([0, 0, -1, 1])
+    col_moves = np.array([-1, 1, 0, 0])
+
+    def __init__(self, num_envs, num_rows=6, num_cols=6, grid=None):
+        # The layout is shared by all mazes, the values are not
+        layout = Environment(num_rows, num_cols, grid)
+        self.num_envs = num_envs
+        self.num_rows = layout.num_rows
+        self.num_cols = layout.num_cols
+        self.grid = layout.grid
+        self.ids = layout.ids
+        self.rewards = layout.rewards
+        self.terminals = layout.terminals
+        self.walls = layout.ids == WALL
+        self.values = np.repeat(layout.values[np.newaxis], num_envs, axis=0)
+
+        self.default_agent_row, self.default_agent_col = layout.default_agent_row, layout.default_agent_col
+        self.agent_rows = np.full(num_envs, self.default_agent_row)
+        self.agent_cols = np.full(num_envs, self.default_agent_col)
+        self.points = np.zeros(num_envs, dtype=np.int64)
+        self.env_indices = np.arange(num_envs)
+        self.flat_moves = self.row_moves * self.num_cols + self.col_moves
+
+
+    def reset(self, mask=None):
+        """
+        Reset the agent positions and the points earned
+
+        :param mask: optional boolean array selecting the mazes to reset, all mazes are reset by default
+        """
+        if mask is None:
+            mask = slice(None)
+        self.agent_rows[mask] = self.default_agent_row
+        self.agent_cols[mask] = self.default_agent_col
+        self.points[mask] = 0
+
+
+    def is_terminal(self):
+        """
+        :return: boolean array which is True for the agents that are on a terminal state
+        """
+        return self.terminals[self.agent_rows, self.agent_cols]
+
+
+    def next_values(self):
+        """
+        Calculate reward + value of the next state for every agent and each of the four actions,
+        just like Policy.select_action does for a single maze.
+
+        :return: array of shape (num_envs, 4)
+        """
+        # Work on flat indices, which is faster than indexing with rows and columns
+        cells = (self.agent_rows * self.num_cols + self.agent_cols)[:, np.newaxis] + self.flat_moves
+        env_offsets = (self.env_indices * (self.num_rows * self.num_cols))[:, np.newaxis]
+        return self.rewards.ravel()[cells] + self.values.ravel()[env_offsets + cells]
+
+
+    def update_values(self):
+        """
+        Update the value of the current state of every agent with the best next value.
+
+        :return: array with the absolute value change of the current state of every agent
+        """
+        rows, cols = self.agent_rows, self.agent_cols
+        old_values = self.values[self.env_indices, rows, cols]
+        new_values = np.where(self.terminals[rows, cols], old_values, self.next_values().max(axis=1))
+        self.values[self.env_indices, rows, cols] = new_values
+        return np.abs(new_values - old_values)
+
+
+    def step(self, actions):
+        """
+        Perform one step in every maze by taking the given actions and updating the agent positions.
+        Agents that would move into a wall stay on the same state. Also updates the amount of points.
+
+        :param actions: array with the action of every agent (0 = left, 1 = right, 2 = up, 3 = down)
+        :return: a tuple of the rewards gained, and a boolean array of the agents that reached a terminal state
+        """
+        rows = self.agent_rows + self.row_moves[actions]
+        cols = self.agent_cols + self.col_moves[actions]
+        valid = ~self.walls[rows, cols]
+        self.agent_rows = np.where(valid, rows, self.agent_rows)
+        self.agent_cols = np.where(valid, cols, self.agent_cols)
+
+        # Update points with the gained rewards
+        rewards = self.rewards[self.agent_rows, self.agent_cols]
+        self.points += rewards
+        return rewards, self.is_terminal()
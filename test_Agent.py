@@ -0,0 +1,49 @@
+from Agent import Agent
+import numpy as np
+import pytest
+
+
+def play(seed, learner=None, max_runs=None, checkpoint=None, checkpoint_every=None):
+    """
+    Play a headless game on the default maze, optionally saving or resuming from a checkpoint
+    """
+    agent = Agent(render=False, seed=seed, learner=learner)
+    if checkpoint_every is not None:
+        agent.set_checkpointing(checkpoint, every=checkpoint_every)
+    elif checkpoint is not None:
+        agent.load_checkpoint(checkpoint)
+    runs = agent.autonomous_play(probability=0.8, max_runs=max_runs)
+    return agent, runs
+
+
+@pytest.mark.parametrize("learner, seed, resume_run", [(None, 0, 5), ("q_learning", 5, 14), ("sarsa", 0, 20)])
+def test_resumed_game_matches_uninterrupted_game(tmp_path, learner, seed, resume_run):
+    """
+    A game resumed from a checkpoint plays exactly like the game that was never interrupted
+    """
+    checkpoint = str(tmp_path / "checkpoint.npz")
+    reference, reference_runs = play(seed, learner)
+    assert reference_runs > resume_run
+
+    play(seed, learner, max_runs=resume_run, checkpoint=checkpoint, checkpoint_every=resume_run)
+    resumed, resumed_runs = play(seed, learner, checkpoint=checkpoint)
+
+    assert resumed_runs == reference_runs
+    assert resumed.steps == reference.steps
+    assert resumed.maze.points == reference.maze.points
+    assert np.array_equal(resumed.maze.values, reference.maze.values)
+    if learner is not None:
+        assert np.array_equal(resumed.learner.q_values, reference.learner.q_values)
+
+
+def test_trajectory_log_is_readable_after_play(tmp_path):
+    """
+    Every step is in the log as soon as autonomous play returns, without closing the log
+    """
+    from TrajectoryLog import TrajectoryLog
+
+    path = str(tmp_path / "steps.log")
+    agent = Agent(render=False, seed=0, trajectory_log=path)
+    agent.autonomous_play(probability=0.8)
+    assert sum(len(chunk) for chunk in TrajectoryLog.chunks(path)) == agent.steps
+    agent.trajectory_log.close()
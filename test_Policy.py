@@ -0,0 +1,34 @@
+from Policy import Policy
+from collections import Counter
+import numpy as np
+
+
+def test_choose_action_breaks_ties_randomly_on_arrays():
+    """
+    Q-table rows are NumPy arrays, ties between the best actions must still be broken at random
+    """
+    policy = Policy(0)
+    actions = Counter(policy.choose_action(np.array([0.0, 0.0, -1.0, -1.0])) for _ in range(2000))
+    assert set(actions) == {0, 1}
+    assert min(actions.values()) > 800
+
+
+def test_choose_action_slips_to_other_actions_on_arrays():
+    """
+    With probability 0 the agent always slips to one of the non-best actions, and always returns an action
+    """
+    policy = Policy(0)
+    actions = Counter(policy.choose_action(np.array([0.0, 0.0, -1.0, -1.0]), probability=0.0) for _ in range(2000))
+    assert set(actions) == {2, 3}
+    assert min(actions.values()) > 800
+
+
+def test_choose_action_arrays_match_lists():
+    """
+    Arrays and lists of the same values give the same actions from the same seed
+    """
+    values = [0.0, 0.0, -1.0, -2.0]
+    array_policy, list_policy = Policy(1), Policy(1)
+    for _ in range(500):
+        assert (array_policy.choose_action(np.array(values), probability=0.7, exploration_rate=0.1)
+                == list_policy.choose_action(values, probability=0.7, exploration_rate=0.1))